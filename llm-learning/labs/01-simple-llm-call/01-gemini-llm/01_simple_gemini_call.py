@@ -13,6 +13,10 @@ This shows the fundamentals - Exercise 2 (chatbot.py) shows production practices
 """
 
 import os
+import sys
+import json
+import time
+import tempfile
 from dotenv import load_dotenv  # Load .env files into environment
 import google.generativeai as genai  # Google's Gemini SDK
 
@@ -39,11 +43,51 @@ if not api_key:
 # This authenticates all subsequent API calls
 genai.configure(api_key=api_key)
 
-print("Available Models:")
-for m in genai.list_models():
-    # Only list models that support the generateContent method
-    if 'generateContent' in m.supported_generation_methods:
-        print(f"- {m.name} (Supports generateContent)")
+# Listing models is a network call. We cache the result on disk so repeated
+# runs of this script skip the extra HTTPS round-trip.
+MODELS_CACHE_FILE = os.path.expanduser('~/.cache/gemini_models.json')
+
+
+def _load_supported_models(ttl=86400):
+    """Return names of models supporting generateContent (cached for `ttl` seconds)"""
+    try:
+        if time.time() - os.path.getmtime(MODELS_CACHE_FILE) < ttl:
+            with open(MODELS_CACHE_FILE) as f:
+                return json.load(f)
+    except (OSError, ValueError):
+        pass  # Missing or corrupt cache - fall through and refresh it
+
+    # Only keep models that support the generateContent method
+    names = [
+        m.name for m in genai.list_models()
+        if 'generateContent' in m.supported_generation_methods
+    ]
+
+    # Write to a temp file first, then swap it in, so a crash never leaves
+    # a half-written cache behind
+    try:
+        cache_dir = os.path.dirname(MODELS_CACHE_FILE)
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(names, f)
+            os.replace(tmp_path, MODELS_CACHE_FILE)
+        finally:
+            # Still there only if the swap didn't happen
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    except OSError:
+        pass  # Caching is an optimization - never fail the script over it
+
+    return names
+
+
+# Listing models is optional - run with --list-models (or LIST_MODELS=1) to see them
+if os.getenv('LIST_MODELS') == '1' or '--list-models' in sys.argv:
+    print("Available Models:")
+    for name in _load_supported_models():
+        print(f"- {name} (Supports generateContent)")
 
 # ============================================================================
 # STEP 3: Initialize the Model
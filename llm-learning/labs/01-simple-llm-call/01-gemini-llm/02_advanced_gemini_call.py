@@ -4,10 +4,18 @@ Best practices for LLM applications
 """
 
 import os
+import re
 import sys
+import json
 import time
-from typing import Optional, List, Dict
+import hashlib
+import threading
+from collections import OrderedDict, deque
+from itertools import islice
+from typing import Any, Optional, List, Dict, Deque, Iterator, Tuple
 from datetime import datetime
+import diskcache
+import tiktoken
 from dotenv import load_dotenv
 import google.generativeai as genai
 from google.generativeai.types import GenerationConfig
@@ -15,14 +23,111 @@ from google.generativeai.types import GenerationConfig
 # Load environment
 load_dotenv()
 
+# Batching more than this many queries into one prompt hurts answer quality
+MAX_BATCH_SIZE = 16
+
+# Shown when the model returns no text (usually blocked by safety filters)
+BLOCKED_MESSAGE = (
+    "⚠️ Response was blocked due to safety filters. "
+    "Please try rephrasing your question."
+)
+
+# Matches the "### <n>" marker that starts each answer in a batched response
+BATCH_ANSWER_PATTERN = re.compile(r'^###\s*(\d+)', re.MULTILINE)
+
+
+def _response_text(response) -> str:
+    """
+    Return the text of a Gemini response, or "" if there is none
+
+    response.text is assembled from the candidate parts on every access and
+    raises ValueError when the response was blocked, so read it exactly once.
+    """
+    try:
+        return response.text or ""
+    except ValueError:
+        return ""
+
+
+# tiktoken encoding, loaded on first use (None = not loaded yet, False = unavailable)
+_encoding = None
+
+
+def _estimate_tokens(text: str) -> int:
+    """
+    Approximate token count, used only for context budgeting
+
+    Uses tiktoken's cl100k_base, which is an OpenAI tokenizer and so only an
+    estimate for Gemini, Groq and Ollama models. It downloads its BPE file
+    the first time; if that fails (offline, blocked), fall back to roughly
+    4 characters per token.
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = False
+    if _encoding is False:
+        return len(text) // 4
+    return len(_encoding.encode(text))
+
+
+class _ResponseCache:
+    """
+    Two-level response cache: in-memory LRU backed by an on-disk store
+
+    Identical requests (same model, settings and messages) return the saved
+    response instead of calling the API again.
+    """
+
+    def __init__(self, directory: str = '~/.cache/llm_chat', max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._disk = diskcache.Cache(os.path.expanduser(directory))
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        """Build a stable cache key from JSON-serializable parts"""
+        blob = json.dumps(parts, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(blob.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response, or None on a miss"""
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return self._memory[key]
+        value = self._disk.get(key)
+        if value is not None:
+            self._remember(key, value)
+        return value
+
+    def set(self, key: str, value: str):
+        """Store a response in memory and on disk"""
+        self._remember(key, value)
+        self._disk.set(key, value)
+
+    def _remember(self, key: str, value: str):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)  # Evict least recently used
+
+
 class GeminiChatbot:
     """Production-ready chatbot using Google Gemini"""
     
+    # Models already built, keyed by (model_name, temperature, max_tokens),
+    # shared by all instances so identical settings reuse one model object
+    _MODEL_POOL: Dict[Tuple[str, float, int], Any] = {}
+    
     def __init__(
         self,
         model_name: str = 'gemini-2.5-flash',
         temperature: float = 0.7,
         max_tokens: int = 1000,
+        max_context_tokens: int = 8192,
+        max_history_turns: int = 50,
     ):
         """
         Initialize the chatbot
@@ -31,12 +136,23 @@ class GeminiChatbot:
             model_name: Gemini model to use
             temperature: Randomness in responses (0.0-1.0)
             max_tokens: Maximum response length
+            max_context_tokens: Token budget for prompt + history + response
+            max_history_turns: Maximum exchanges kept in memory (oldest dropped first)
         """
         self.model_name = model_name
         self.temperature = temperature
         self.max_tokens = max_tokens
-        self.conversation_history: List[Dict[str, str]] = []
+        self.max_context_tokens = max_context_tokens
+        self.max_history_turns = max_history_turns
+        # deque(maxlen=...) drops the oldest exchange automatically when full
+        self.conversation_history: Deque[Dict[str, str]] = deque(maxlen=max_history_turns)
+        self._token_counts: Deque[int] = deque(maxlen=max_history_turns)  # Per history entry
+        # History pre-rendered as "User: ...\nAssistant: ...\n" text, starting
+        # at entry _rendered_from, so building a prompt needs no loop
+        self._history_rendered = ''
+        self._rendered_from = 0
         self.model = None
+        self._cache: Optional[_ResponseCache] = None
         
         # Initialize
         self._validate_environment()
@@ -53,7 +169,12 @@ class GeminiChatbot:
         genai.configure(api_key=api_key)
     
     def _initialize_model(self):
-        """Initialize the Gemini model"""
+        """Initialize the Gemini model (reused from the pool when possible)"""
+        pool_key = (self.model_name, self.temperature, self.max_tokens)
+        self.model = self._MODEL_POOL.get(pool_key)
+        if self.model is not None:
+            return
+        
         try:
             self.model = genai.GenerativeModel(
                 model_name=self.model_name,
@@ -64,11 +185,25 @@ class GeminiChatbot:
             )
         except Exception as e:
             raise RuntimeError(f"Failed to initialize model: {e}")
+        
+        self._MODEL_POOL[pool_key] = self.model
+        
+        # Open the connection (DNS + TCP + TLS) in the background while the
+        # user is still typing, so the first real prompt doesn't pay for it
+        threading.Thread(target=self._prewarm, daemon=True).start()
+    
+    def _prewarm(self):
+        """Make a tiny request to warm up the connection (errors are ignored)"""
+        try:
+            self.model.count_tokens("ping")
+        except Exception:
+            pass  # The real request will report any problem
     
     def generate_response(
         self,
         prompt: str,
-        save_history: bool = True
+        save_history: bool = True,
+        use_cache: Optional[bool] = None
     ) -> str:
         """
         Generate a response to the user prompt
@@ -88,6 +223,9 @@ class GeminiChatbot:
             prompt: User's input message
             save_history: Whether to save to conversation history and include
                          previous exchanges in the prompt sent to the model
+            use_cache: Reuse saved responses for identical requests.
+                       Defaults to True only when temperature is 0
+                       (deterministic), since other answers are meant to vary.
             
         Returns:
             Bot's response as string
@@ -96,81 +234,259 @@ class GeminiChatbot:
             ValueError: If prompt is invalid
             RuntimeError: If API call fails
         """
-        # Validate prompt
-        if not prompt or not prompt.strip():
-            raise ValueError("Prompt cannot be empty")
-        
-        if len(prompt) > 10000:
-            raise ValueError("Prompt too long (max 10,000 characters)")
+        self._validate_prompt(prompt)
         
         try:
-            # Build context from conversation history (if save_history is enabled)
-            # This is the KEY: we send previous conversation to the model!
-            if save_history and self.conversation_history:
-                # Format: Include last few exchanges for context
-                context_messages = []
-                for entry in self.conversation_history[-5:]:  # Last 5 exchanges
-                    context_messages.append(f"User: {entry['user']}")
-                    context_messages.append(f"Assistant: {entry['bot']}")
-                
-                # Combine history + current prompt
-                full_prompt = "\n".join(context_messages) + f"\nUser: {prompt}\nAssistant:"
-            else:
-                # No history - just send current prompt
-                full_prompt = prompt
+            full_prompt = self._build_full_prompt(prompt, save_history)
             
-            # Generate response with context
-            response = self.model.generate_content(full_prompt)
-            
-            # Extract response text
-            response_text = response.text if response.text else ""
-            
-            # Check for blocked content
-            if not response_text:
-                response_text = (
-                    "⚠️ Response was blocked due to safety filters. "
-                    "Please try rephrasing your question."
+            # Check the cache first - identical requests get the saved answer
+            if use_cache is None:
+                use_cache = self.temperature == 0.0
+            cache_key = None
+            response_text = None
+            if use_cache:
+                if self._cache is None:
+                    self._cache = _ResponseCache()
+                cache_key = _ResponseCache.make_key(
+                    self.model_name, self.temperature, self.max_tokens, full_prompt
                 )
+                response_text = self._cache.get(cache_key)
+            
+            if response_text is None:
+                # Generate response with context
+                response = self.model.generate_content(full_prompt)
+                
+                # Extract response text (read .text once - the SDK rebuilds it on each access)
+                response_text = _response_text(response)
+                
+                # Check for blocked content
+                if not response_text:
+                    response_text = BLOCKED_MESSAGE
+                elif cache_key:
+                    self._cache.set(cache_key, response_text)
             
             # Save to history (for next call)
             if save_history:
-                self.conversation_history.append({
-                    'timestamp': datetime.now().isoformat(),
-                    'user': prompt,
-                    'bot': response_text
-                })
+                self._record_exchange(prompt, response_text)
             
             return response_text
         
         except Exception as e:
-            error_msg = str(e)
+            raise self._api_error(e)
+    
+    def generate_stream(
+        self,
+        prompt: str,
+        save_history: bool = True
+    ) -> Iterator[str]:
+        """
+        Generate a response, yielding text chunks as they arrive
+        
+        Same as generate_response(), but the first words can be shown while
+        the model is still writing the rest. The complete response is saved
+        to history once the stream finishes.
+        
+        Args:
+            prompt: User's input message
+            save_history: Whether to save to conversation history and include
+                         previous exchanges in the prompt sent to the model
             
-            # Handle specific errors
-            if "API_KEY_INVALID" in error_msg:
-                raise RuntimeError("Invalid API key")
-            elif "RESOURCE_EXHAUSTED" in error_msg:
-                raise RuntimeError("Rate limit exceeded. Please wait and try again.")
-            elif "quota" in error_msg.lower():
-                raise RuntimeError("API quota exceeded")
-            else:
-                raise RuntimeError(f"API error: {error_msg}")
+        Yields:
+            Pieces of the bot's response
+            
+        Raises:
+            ValueError: If prompt is invalid
+            RuntimeError: If API call fails
+        """
+        self._validate_prompt(prompt)
+        
+        try:
+            full_prompt = self._build_full_prompt(prompt, save_history)
+            pieces = []
+            for chunk in self.model.generate_content(full_prompt, stream=True):
+                text = _response_text(chunk)
+                if text:
+                    pieces.append(text)
+                    yield text
+        except Exception as e:
+            raise self._api_error(e)
+        
+        response_text = "".join(pieces)
+        if not response_text:
+            response_text = BLOCKED_MESSAGE
+            yield response_text
+        
+        if save_history:
+            self._record_exchange(prompt, response_text)
+    
+    def _validate_prompt(self, prompt: str):
+        """Raise ValueError if the prompt is empty or too long"""
+        if not prompt or not prompt.strip():
+            raise ValueError("Prompt cannot be empty")
+        
+        if len(prompt) > 10000:
+            raise ValueError("Prompt too long (max 10,000 characters)")
+    
+    def _build_full_prompt(self, prompt: str, use_history: bool) -> str:
+        """Build the text sent to the model, including history if requested"""
+        # Build context from conversation history (if enabled)
+        # This is the KEY: we send previous conversation to the model!
+        if use_history and self.conversation_history:
+            # Include as many recent exchanges as fit the token budget.
+            # Only re-render when older turns fall out of the budget.
+            start = self._budget_start()
+            if start != self._rendered_from:
+                # A list (not a generator) lets join() size the result in one pass
+                self._history_rendered = ''.join([
+                    f"User: {entry['user']}\nAssistant: {entry['bot']}\n"
+                    for entry in islice(self.conversation_history, start, None)
+                ])
+                self._rendered_from = start
+            
+            # Combine history + current prompt in a single allocation
+            return ''.join((self._history_rendered, "User: ", prompt, "\nAssistant:"))
+        
+        # No history - just send current prompt
+        return prompt
+    
+    def _record_exchange(self, prompt: str, response_text: str):
+        """Append one user/bot exchange to the conversation history"""
+        # A full deque drops its oldest entry, shifting rendered indices by one
+        if len(self.conversation_history) == self.conversation_history.maxlen:
+            self._rendered_from -= 1  # -1 means the oldest rendered turn is gone
+        
+        self.conversation_history.append({
+            'ts': time.time(),  # Formatted only when history is shown or saved
+            'user': prompt,
+            'bot': response_text
+        })
+        self._token_counts.append(self._count_tokens(prompt + response_text))
+        self._history_rendered += f"User: {prompt}\nAssistant: {response_text}\n"
+    
+    @staticmethod
+    def _api_error(e: Exception) -> RuntimeError:
+        """Convert an SDK exception into a user-friendly RuntimeError"""
+        error_msg = str(e)
+        
+        # Handle specific errors
+        if "API_KEY_INVALID" in error_msg:
+            return RuntimeError("Invalid API key")
+        elif "RESOURCE_EXHAUSTED" in error_msg:
+            return RuntimeError("Rate limit exceeded. Please wait and try again.")
+        elif "quota" in error_msg.lower():
+            return RuntimeError("API quota exceeded")
+        else:
+            return RuntimeError(f"API error: {error_msg}")
+    
+    def _count_tokens(self, text: str) -> int:
+        """Approximate token count (see _estimate_tokens)"""
+        return _estimate_tokens(text)
+    
+    def _budget_start(self) -> int:
+        """
+        Return the index of the oldest exchange that fits in the context budget
+        
+        Walks from newest to oldest, dropping older turns once the budget
+        (context window minus room for the reply) is used up.
+        """
+        budget = self.max_context_tokens - self.max_tokens - 512
+        used = 0
+        start = len(self.conversation_history)
+        for count in reversed(self._token_counts):
+            used += count
+            if used > budget:
+                break
+            start -= 1
+        return start
+    
+    def generate_batch(
+        self,
+        prompts: List[str],
+        batch_size: int = 8
+    ) -> List[str]:
+        """
+        Answer many independent prompts with fewer API calls
+        
+        Several prompts are numbered and sent together in a single request,
+        then the response is split back into one answer per prompt. This
+        saves network round-trips when processing many inputs (e.g. classifying
+        a list of documents). Batched calls do not use or update history.
+        
+        Args:
+            prompts: Independent user prompts
+            batch_size: Prompts per request (capped at MAX_BATCH_SIZE)
+            
+        Returns:
+            One answer per prompt, in the same order ("" if an answer is missing)
+            
+        Raises:
+            ValueError: If any prompt is invalid
+            RuntimeError: If API call fails
+        """
+        for prompt in prompts:
+            self._validate_prompt(prompt)
+        
+        batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+        answers: List[str] = []
+        
+        for start in range(0, len(prompts), batch_size):
+            chunk = prompts[start:start + batch_size]
+            
+            # Number each query so we can find its answer in the response
+            lines = [
+                "Answer each numbered query independently, "
+                "prefix each answer with '### <n>'."
+            ]
+            for i, prompt in enumerate(chunk, 1):
+                lines.append(f"{i}. {prompt}")
+            full_prompt = "\n".join(lines)
+            
+            try:
+                response = self.model.generate_content(full_prompt)
+                response_text = _response_text(response)
+            except Exception as e:
+                raise self._api_error(e)
+            
+            # split() with a capture group returns [before, n1, ans1, n2, ans2, ...]
+            parts = BATCH_ANSWER_PATTERN.split(response_text)
+            by_number = {}
+            for number, answer in zip(parts[1::2], parts[2::2]):
+                by_number[int(number)] = answer.strip()
+            
+            answers.extend(by_number.get(i, "") for i in range(1, len(chunk) + 1))
+        
+        return answers
     
     def get_history(self) -> List[Dict[str, str]]:
-        """Get conversation history"""
-        return self.conversation_history.copy()
+        """Get conversation history (with ISO-formatted timestamps)"""
+        return [
+            {
+                'timestamp': datetime.fromtimestamp(entry['ts']).isoformat(),
+                'user': entry['user'],
+                'bot': entry['bot'],
+            }
+            for entry in self.conversation_history
+        ]
     
     def clear_history(self):
         """Clear conversation history"""
-        self.conversation_history = []
+        self.conversation_history.clear()
+        self._token_counts.clear()
+        self._history_rendered = ''
+        self._rendered_from = 0
     
     def save_history_to_file(self, filename: str):
         """Save conversation history to file"""
-        with open(filename, 'w') as f:
-            for entry in self.conversation_history:
-                f.write(f"[{entry['timestamp']}]\n")
-                f.write(f"User: {entry['user']}\n")
-                f.write(f"Bot: {entry['bot']}\n")
-                f.write("-" * 60 + "\n")
+        # Build the whole file in memory, then write it in one call
+        separator = "-" * 60
+        chunks = []
+        for entry in self.conversation_history:
+            timestamp = datetime.fromtimestamp(entry['ts']).isoformat()
+            chunks.append(
+                f"[{timestamp}]\nUser: {entry['user']}\nBot: {entry['bot']}\n{separator}\n"
+            )
+        with open(filename, 'w', buffering=1 << 16) as f:
+            f.write("".join(chunks))
 
 def print_welcome():
     """Print welcome message"""
@@ -186,6 +502,40 @@ def print_welcome():
     print("  • 'save' - Save conversation to file")
     print("\n" + "=" * 60)
 
+def clear_history(chatbot: GeminiChatbot):
+    """Handle the 'clear' command"""
+    chatbot.clear_history()
+    print("✅ Conversation history cleared!")
+
+def show_history(chatbot: GeminiChatbot):
+    """Handle the 'history' command"""
+    history = chatbot.get_history()
+    if not history:
+        print("No conversation history yet.")
+        return
+    print("\n📜 Conversation History:")
+    print("-" * 60)
+    for entry in history:
+        print(f"[{entry['timestamp']}]")
+        print(f"You: {entry['user']}")
+        print(f"Bot: {entry['bot'][:100]}...")
+        print()
+
+def save_history(chatbot: GeminiChatbot):
+    """Handle the 'save' command"""
+    filename = f"chat_history_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+    chatbot.save_history_to_file(filename)
+    print(f"✅ Conversation saved to {filename}")
+
+# Chat commands -> handler(chatbot). Built once, looked up with a single dict access.
+COMMANDS = {
+    'help': lambda chatbot: print_welcome(),
+    'clear': clear_history,
+    'history': show_history,
+    'save': save_history,
+}
+EXIT_COMMANDS = frozenset({'quit', 'exit', 'bye'})
+
 def main():
     """Main function to run the chatbot"""
     try:
@@ -210,42 +560,20 @@ def main():
                 # Handle commands
                 command = user_input.lower()
                 
-                if command in ['quit', 'exit', 'bye']:
+                if command in EXIT_COMMANDS:
                     print("\n👋 Thank you for chatting! Goodbye!")
                     break
                 
-                if command == 'help':
-                    print_welcome()
-                    continue
-                
-                if command == 'clear':
-                    chatbot.clear_history()
-                    print("✅ Conversation history cleared!")
-                    continue
-                
-                if command == 'history':
-                    history = chatbot.get_history()
-                    if not history:
-                        print("No conversation history yet.")
-                    else:
-                        print("\n📜 Conversation History:")
-                        print("-" * 60)
-                        for entry in history:
-                            print(f"[{entry['timestamp']}]")
-                            print(f"You: {entry['user']}")
-                            print(f"Bot: {entry['bot'][:100]}...")
-                            print()
-                    continue
-                
-                if command == 'save':
-                    filename = f"chat_history_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
-                    chatbot.save_history_to_file(filename)
-                    print(f"✅ Conversation saved to {filename}")
+                handler = COMMANDS.get(command)
+                if handler:
+                    handler(chatbot)
                     continue
                 
-                # Generate response
-                response = chatbot.generate_response(user_input)
-                print(f"\n🤖 Bot: {response}")
+                # Stream the response so text appears as soon as it's generated
+                print("\n🤖 Bot: ", end="", flush=True)
+                for piece in chatbot.generate_stream(user_input):
+                    print(piece, end="", flush=True)
+                print()
             
             except ValueError as e:
                 print(f"❌ Invalid input: {e}")
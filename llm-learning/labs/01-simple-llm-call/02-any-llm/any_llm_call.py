@@ -7,22 +7,232 @@ This uses LangChain, the industry-standard framework for LLM applications.
 
 import os
 import sys
-from typing import List, Dict, Optional
+import json
+import time
+import random
+import asyncio
+import socket
+import hashlib
+import threading
+from collections import OrderedDict, deque
+from itertools import islice
+from typing import Any, List, Dict, Deque, Optional, Iterator, Tuple, Union
 from datetime import datetime
+import httpx
+import diskcache
+import tiktoken
 from dotenv import load_dotenv
 
 # LangChain imports
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_openai import ChatOpenAI
-from langchain_anthropic import ChatAnthropic
-from langchain_groq import ChatGroq
-from langchain_ollama import ChatOllama
+# Provider packages are imported on demand (see _PROVIDER_IMPORTERS) so that
+# using one provider doesn't pay the import time of all five.
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
 
 # Load environment
 load_dotenv()
 
 
+# ============================================================================
+# Lazy provider imports
+# ============================================================================
+def _import_google():
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI
+
+
+def _import_openai():
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI
+
+
+def _import_anthropic():
+    from langchain_anthropic import ChatAnthropic
+    return ChatAnthropic
+
+
+def _import_groq():
+    from langchain_groq import ChatGroq
+    return ChatGroq
+
+
+def _import_ollama():
+    from langchain_ollama import ChatOllama
+    return ChatOllama
+
+
+# Provider name -> function returning its LangChain chat model class
+_PROVIDER_IMPORTERS = {
+    'google': _import_google,
+    'openai': _import_openai,
+    'anthropic': _import_anthropic,
+    'groq': _import_groq,
+    'ollama': _import_ollama,
+}
+
+
+# ============================================================================
+# Shared HTTP transport
+# ============================================================================
+# One HTTP/2 connection pool reused by every OpenAI-compatible client
+# (OpenAI, Groq). Keep-alive avoids a new TLS handshake on each request,
+# and TCP_NODELAY stops small request bodies from waiting to be batched.
+_HTTP_LIMITS = httpx.Limits(max_keepalive_connections=4, keepalive_expiry=20)
+_SOCKET_OPTIONS = [(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)]
+_http_client: Optional[httpx.Client] = None
+_http_async_client: Optional[httpx.AsyncClient] = None
+# The async client's pool is bound to the event loop that first uses it,
+# so all async requests run on this one loop (see _get_async_loop)
+_async_loop: Optional[asyncio.AbstractEventLoop] = None
+_async_loop_lock = threading.Lock()
+
+
+# Endpoints used to pre-warm the shared pool for providers that use it
+_PREWARM_URLS = {
+    'openai': 'https://api.openai.com/v1/models',
+    'groq': 'https://api.groq.com/openai/v1/models',
+}
+
+
+def _prewarm_connection(url: str):
+    """
+    Open a pooled connection (DNS + TCP + TLS) to `url` ahead of time
+
+    Runs in a background thread while the user is typing, so the first real
+    prompt reuses the open connection. The response itself is ignored.
+    """
+    http_client, _ = _get_http_clients()
+    try:
+        http_client.head(url, timeout=5)
+    except httpx.HTTPError:
+        pass  # The real request will report any problem
+
+
+def _get_http_clients():
+    """Return the shared (sync, async) httpx clients, creating them on first use"""
+    global _http_client, _http_async_client
+    if _http_client is None:
+        _http_client = httpx.Client(
+            transport=httpx.HTTPTransport(
+                http2=True, limits=_HTTP_LIMITS, socket_options=_SOCKET_OPTIONS
+            )
+        )
+        _http_async_client = httpx.AsyncClient(
+            transport=httpx.AsyncHTTPTransport(
+                http2=True, limits=_HTTP_LIMITS, socket_options=_SOCKET_OPTIONS
+            )
+        )
+    return _http_client, _http_async_client
+
+
+def _get_async_loop() -> asyncio.AbstractEventLoop:
+    """
+    Return the event loop that owns the shared async client, starting it on first use
+
+    The loop runs forever in a daemon thread. Callers submit coroutines with
+    asyncio.run_coroutine_threadsafe, so every chatbot (and every calling
+    loop or thread) uses the async client on the same loop.
+    """
+    global _async_loop
+    with _async_loop_lock:
+        if _async_loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, daemon=True).start()
+            _async_loop = loop
+    return _async_loop
+
+
+class _RateLimiter:
+    """
+    Simple token-bucket limiter for async code
+
+    Allows at most `rpm` requests per minute, with bursts up to `rpm` tokens.
+    """
+
+    def __init__(self, rpm: int):
+        self.rate = rpm / 60.0          # Tokens added per second
+        self.capacity = float(rpm)
+        self.tokens = float(rpm)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait until a request is allowed"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+# tiktoken encoding, loaded on first use (None = not loaded yet, False = unavailable)
+_encoding = None
+
+
+def _estimate_tokens(text: str) -> int:
+    """
+    Approximate token count, used only for context budgeting
+
+    Uses tiktoken's cl100k_base, which is an OpenAI tokenizer and so only an
+    estimate for Gemini, Groq and Ollama models. It downloads its BPE file
+    the first time; if that fails (offline, blocked), fall back to roughly
+    4 characters per token.
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = False
+    if _encoding is False:
+        return len(text) // 4
+    return len(_encoding.encode(text))
+
+
+class _ResponseCache:
+    """
+    Two-level response cache: in-memory LRU backed by an on-disk store
+
+    Identical requests (same model, settings and messages) return the saved
+    response instead of calling the API again.
+    """
+
+    def __init__(self, directory: str = '~/.cache/llm_chat', max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._disk = diskcache.Cache(os.path.expanduser(directory))
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        """Build a stable cache key from JSON-serializable parts"""
+        blob = json.dumps(parts, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(blob.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response, or None on a miss"""
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return self._memory[key]
+        value = self._disk.get(key)
+        if value is not None:
+            self._remember(key, value)
+        return value
+
+    def set(self, key: str, value: str):
+        """Store a response in memory and on disk"""
+        self._remember(key, value)
+        self._disk.set(key, value)
+
+    def _remember(self, key: str, value: str):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)  # Evict least recently used
+
+
 class GenericChatbot:
     """
     Production-ready chatbot supporting multiple LLM providers
@@ -35,6 +245,10 @@ class GenericChatbot:
     - Ollama (llama3, mistral, phi3) - Local
     """
     
+    # Chat models already built, keyed by (model_name, temperature, max_tokens).
+    # Shared by all instances so 'switch' back to a model is a dict lookup.
+    _LLM_POOL: Dict[Tuple[str, float, int], Any] = {}
+    
     # Supported models and their configurations
     SUPPORTED_MODELS = {
         # Google Gemini
@@ -118,7 +332,9 @@ class GenericChatbot:
         model_name: str,
         temperature: float = 0.7,
         max_tokens: int = 1000,
-        system_prompt: Optional[str] = None
+        system_prompt: Optional[str] = None,
+        max_context_tokens: int = 8192,
+        max_history_turns: int = 50
     ):
         """
         Initialize the generic chatbot
@@ -128,13 +344,21 @@ class GenericChatbot:
             temperature: Randomness in responses (0.0-1.0)
             max_tokens: Maximum response length
             system_prompt: Optional system instruction
+            max_context_tokens: Token budget for prompt + history + response
+            max_history_turns: Maximum exchanges kept in memory (oldest dropped first)
         """
         self.model_name = model_name
         self.temperature = temperature
         self.max_tokens = max_tokens
         self.system_prompt = system_prompt or "You are a helpful AI assistant."
-        self.conversation_history: List[Dict[str, str]] = []
+        self.max_context_tokens = max_context_tokens
+        self.max_history_turns = max_history_turns
+        # deque(maxlen=...) drops the oldest exchange automatically when full
+        self.conversation_history: Deque[Dict[str, str]] = deque(maxlen=max_history_turns)
+        self._token_counts: Deque[int] = deque(maxlen=max_history_turns)  # Per history entry
         self.llm = None
+        self._system_msg = None
+        self._cache: Optional[_ResponseCache] = None
         
         # Initialize the model
         self._initialize_model()
@@ -151,6 +375,9 @@ class GenericChatbot:
         config = self.SUPPORTED_MODELS[self.model_name]
         provider = config['provider']
         
+        # Built once and reused by every request
+        self._system_msg = SystemMessage(content=self.system_prompt)
+        
         # Check API key if needed
         if config['api_key_env']:
             api_key = os.getenv(config['api_key_env'])
@@ -160,10 +387,19 @@ class GenericChatbot:
                     f"Add it to your .env file to use {config['display_name']}"
                 )
         
+        # Reuse an already-built client with the same settings
+        pool_key = (self.model_name, self.temperature, self.max_tokens)
+        cached = self._LLM_POOL.get(pool_key)
+        if cached is not None:
+            self.llm = cached
+            return
+        
         # Initialize based on provider
         try:
+            chat_model_cls = _PROVIDER_IMPORTERS[provider]()
+            
             if provider == 'google':
-                self.llm = ChatGoogleGenerativeAI(
+                self.llm = chat_model_cls(
                     model=self.model_name,
                     temperature=self.temperature,
                     max_tokens=self.max_tokens,
@@ -171,15 +407,18 @@ class GenericChatbot:
                 )
             
             elif provider == 'openai':
-                self.llm = ChatOpenAI(
+                http_client, http_async_client = _get_http_clients()
+                self.llm = chat_model_cls(
                     model=self.model_name,
                     temperature=self.temperature,
                     max_tokens=self.max_tokens,
-                    openai_api_key=os.getenv('OPENAI_API_KEY')
+                    openai_api_key=os.getenv('OPENAI_API_KEY'),
+                    http_client=http_client,
+                    http_async_client=http_async_client
                 )
             
             elif provider == 'anthropic':
-                self.llm = ChatAnthropic(
+                self.llm = chat_model_cls(
                     model=self.model_name,
                     temperature=self.temperature,
                     max_tokens=self.max_tokens,
@@ -187,17 +426,20 @@ class GenericChatbot:
                 )
             
             elif provider == 'groq':
-                self.llm = ChatGroq(
+                http_client, http_async_client = _get_http_clients()
+                self.llm = chat_model_cls(
                     model=self.model_name,
                     temperature=self.temperature,
                     max_tokens=self.max_tokens,
-                    groq_api_key=os.getenv('GROQ_API_KEY')
+                    groq_api_key=os.getenv('GROQ_API_KEY'),
+                    http_client=http_client,
+                    http_async_client=http_async_client
                 )
             
             elif provider == 'ollama':
                 # Extract model name (remove 'ollama/' prefix)
                 model = self.model_name.replace('ollama/', '')
-                self.llm = ChatOllama(
+                self.llm = chat_model_cls(
                     model=model,
                     temperature=self.temperature,
                     num_predict=self.max_tokens
@@ -205,12 +447,19 @@ class GenericChatbot:
             
         except Exception as e:
             raise RuntimeError(f"Failed to initialize {config['display_name']}: {e}")
+        
+        self._LLM_POOL[pool_key] = self.llm
+        
+        prewarm_url = _PREWARM_URLS.get(provider)
+        if prewarm_url:
+            threading.Thread(target=_prewarm_connection, args=(prewarm_url,), daemon=True).start()
     
     def generate_response(
         self,
         prompt: str,
         save_history: bool = True,
-        use_history: bool = True
+        use_history: bool = True,
+        use_cache: Optional[bool] = None
     ) -> str:
         """
         Generate a response to the user prompt
@@ -219,79 +468,260 @@ class GenericChatbot:
             prompt: User's input message
             save_history: Whether to save to conversation history
             use_history: Whether to use conversation context
+            use_cache: Reuse saved responses for identical requests.
+                       Defaults to True only when temperature is 0.
             
         Returns:
             Bot's response as string
         """
-        # Validate prompt
-        if not prompt or not prompt.strip():
-            raise ValueError("Prompt cannot be empty")
-        
-        if len(prompt) > 10000:
-            raise ValueError("Prompt too long (max 10,000 characters)")
+        self._validate_prompt(prompt)
         
         try:
-            # Build message list
-            messages = []
+            messages = self._build_messages(prompt, use_history)
             
-            # Add system message
-            messages.append(SystemMessage(content=self.system_prompt))
-            
-            # Add conversation history if requested
-            if use_history:
-                for entry in self.conversation_history:
-                    messages.append(HumanMessage(content=entry['user']))
-                    messages.append(AIMessage(content=entry['bot']))
-            
-            # Add current prompt
-            messages.append(HumanMessage(content=prompt))
+            # Check the cache first - identical requests get the saved answer
+            if use_cache is None:
+                use_cache = self.temperature == 0.0
+            cache_key = None
+            response_text = None
+            if use_cache:
+                if self._cache is None:
+                    self._cache = _ResponseCache()
+                cache_key = _ResponseCache.make_key(
+                    self.model_name, self.temperature, self.max_tokens,
+                    [(m.type, m.content) for m in messages]
+                )
+                response_text = self._cache.get(cache_key)
             
-            # Generate response
-            response = self.llm.invoke(messages)
-            response_text = response.content
+            if response_text is None:
+                # Generate response
+                response = self.llm.invoke(messages)
+                response_text = response.content
+                if cache_key:
+                    self._cache.set(cache_key, response_text)
             
             # Save to history
             if save_history:
-                self.conversation_history.append({
-                    'timestamp': datetime.now().isoformat(),
-                    'user': prompt,
-                    'bot': response_text
-                })
+                self._record_exchange(prompt, response_text)
             
             return response_text
         
         except Exception as e:
-            error_msg = str(e)
+            raise self._api_error(e)
+    
+    def generate_stream(
+        self,
+        prompt: str,
+        save_history: bool = True,
+        use_history: bool = True
+    ) -> Iterator[str]:
+        """
+        Generate a response, yielding text chunks as they arrive
+        
+        Same as generate_response(), but the first words can be shown while
+        the model is still writing the rest. The complete response is saved
+        to history once the stream finishes.
+        
+        Args:
+            prompt: User's input message
+            save_history: Whether to save to conversation history
+            use_history: Whether to use conversation context
+            
+        Yields:
+            Pieces of the bot's response
+        """
+        self._validate_prompt(prompt)
+        
+        try:
+            messages = self._build_messages(prompt, use_history)
+            pieces = []
+            for chunk in self.llm.stream(messages):
+                if chunk.content:
+                    pieces.append(chunk.content)
+                    yield chunk.content
+        except Exception as e:
+            raise self._api_error(e)
+        
+        if save_history:
+            self._record_exchange(prompt, "".join(pieces))
+    
+    def _validate_prompt(self, prompt: str):
+        """Raise ValueError if the prompt is empty or too long"""
+        if not prompt or not prompt.strip():
+            raise ValueError("Prompt cannot be empty")
+        
+        if len(prompt) > 10000:
+            raise ValueError("Prompt too long (max 10,000 characters)")
+    
+    def _build_messages(self, prompt: str, use_history: bool) -> list:
+        """Build the message list: system + history (optional) + current prompt"""
+        messages = []
+        
+        # Add system message
+        messages.append(self._system_msg)
+        
+        # Add conversation history if requested (newest turns that fit the budget)
+        if use_history:
+            for entry in self._history_within_budget():
+                messages.append(HumanMessage(content=entry['user']))
+                messages.append(AIMessage(content=entry['bot']))
+        
+        # Add current prompt
+        messages.append(HumanMessage(content=prompt))
+        return messages
+    
+    def _record_exchange(self, prompt: str, response_text: str):
+        """Append one user/bot exchange to the conversation history"""
+        self.conversation_history.append({
+            'ts': time.time(),  # Formatted only when history is shown or saved
+            'user': prompt,
+            'bot': response_text
+        })
+        self._token_counts.append(self._count_tokens(prompt + response_text))
+    
+    @staticmethod
+    def _api_error(e: Exception) -> RuntimeError:
+        """Convert a provider exception into a user-friendly RuntimeError"""
+        error_msg = str(e)
+        
+        # Handle common errors
+        if "API_KEY" in error_msg or "Invalid" in error_msg:
+            return RuntimeError("Invalid API key. Check your .env file.")
+        elif "rate_limit" in error_msg.lower():
+            return RuntimeError("Rate limit exceeded. Please wait and try again.")
+        elif "quota" in error_msg.lower():
+            return RuntimeError("API quota exceeded")
+        else:
+            return RuntimeError(f"API error: {error_msg}")
+    
+    def _count_tokens(self, text: str) -> int:
+        """Approximate token count (see _estimate_tokens)"""
+        return _estimate_tokens(text)
+    
+    def _history_within_budget(self) -> List[Dict[str, str]]:
+        """
+        Return the most recent exchanges that fit in the context budget
+        
+        Walks from newest to oldest, dropping older turns once the budget
+        (context window minus room for the reply) is used up.
+        """
+        budget = self.max_context_tokens - self.max_tokens - 512
+        used = 0
+        start = len(self.conversation_history)
+        for count in reversed(self._token_counts):
+            used += count
+            if used > budget:
+                break
+            start -= 1
+        return list(islice(self.conversation_history, start, None))
+    
+    async def agenerate_many(
+        self,
+        prompts: List[str],
+        max_concurrency: int = 10,
+        rpm: Optional[int] = None,
+        max_retries: int = 3
+    ) -> List[Union[str, BaseException]]:
+        """
+        Generate responses for many independent prompts concurrently
+        
+        Requests run in parallel (up to max_concurrency at once) instead of
+        one after another. Prompts do not use or update conversation history.
+        The requests themselves run on the module's async loop (see
+        _get_async_loop), which owns the shared async HTTP client, so this
+        can be awaited from any event loop.
+        
+        Args:
+            prompts: Independent user prompts
+            max_concurrency: Maximum requests in flight at the same time
+            rpm: Optional requests-per-minute limit (None = unlimited)
+            max_retries: Retries for rate-limit errors (exponential backoff)
             
-            # Handle common errors
-            if "API_KEY" in error_msg or "Invalid" in error_msg:
-                raise RuntimeError("Invalid API key. Check your .env file.")
-            elif "rate_limit" in error_msg.lower():
-                raise RuntimeError("Rate limit exceeded. Please wait and try again.")
-            elif "quota" in error_msg.lower():
-                raise RuntimeError("API quota exceeded")
-            else:
-                raise RuntimeError(f"API error: {error_msg}")
+        Returns:
+            One result per prompt, in order. Failed prompts hold the
+            RuntimeError that was raised instead of a string.
+        """
+        future = asyncio.run_coroutine_threadsafe(
+            self._run_many(prompts, max_concurrency, rpm, max_retries),
+            _get_async_loop()
+        )
+        return await asyncio.wrap_future(future)
+    
+    def generate_many(
+        self,
+        prompts: List[str],
+        max_concurrency: int = 10,
+        rpm: Optional[int] = None,
+        max_retries: int = 3
+    ) -> List[Union[str, BaseException]]:
+        """Blocking version of agenerate_many() for synchronous code"""
+        return asyncio.run_coroutine_threadsafe(
+            self._run_many(prompts, max_concurrency, rpm, max_retries),
+            _get_async_loop()
+        ).result()
+    
+    async def _run_many(
+        self,
+        prompts: List[str],
+        max_concurrency: int,
+        rpm: Optional[int],
+        max_retries: int
+    ) -> List[Union[str, BaseException]]:
+        """Run the batch; must be called on the module's async loop"""
+        for prompt in prompts:
+            self._validate_prompt(prompt)
+        
+        # Created on the async loop so they belong to it
+        sem = asyncio.Semaphore(max_concurrency)
+        rate_limiter = _RateLimiter(rpm) if rpm else None
+        
+        async def run_one(prompt: str) -> str:
+            messages = [self._system_msg, HumanMessage(content=prompt)]
+            for attempt in range(max_retries + 1):
+                async with sem:
+                    if rate_limiter:
+                        await rate_limiter.acquire()
+                    try:
+                        response = await self.llm.ainvoke(messages)
+                        return response.content
+                    except Exception as e:
+                        error_msg = str(e)
+                        if "rate_limit" not in error_msg.lower() or attempt == max_retries:
+                            raise RuntimeError(f"API error: {error_msg}")
+                # Back off outside the semaphore so other requests can proceed
+                await asyncio.sleep(2 ** attempt + random.random())
+        
+        tasks = [run_one(prompt) for prompt in prompts]
+        return await asyncio.gather(*tasks, return_exceptions=True)
     
     def get_history(self) -> List[Dict[str, str]]:
-        """Get conversation history"""
-        return self.conversation_history.copy()
+        """Get conversation history (with ISO-formatted timestamps)"""
+        return [
+            {
+                'timestamp': datetime.fromtimestamp(entry['ts']).isoformat(),
+                'user': entry['user'],
+                'bot': entry['bot'],
+            }
+            for entry in self.conversation_history
+        ]
     
     def clear_history(self):
         """Clear conversation history"""
-        self.conversation_history = []
+        self.conversation_history.clear()
+        self._token_counts.clear()
     
     def save_history_to_file(self, filename: str):
         """Save conversation history to file"""
-        with open(filename, 'w') as f:
-            f.write(f"Model: {self.model_name}\n")
-            f.write(f"System: {self.system_prompt}\n")
-            f.write("=" * 60 + "\n\n")
-            for entry in self.conversation_history:
-                f.write(f"[{entry['timestamp']}]\n")
-                f.write(f"User: {entry['user']}\n")
-                f.write(f"Bot: {entry['bot']}\n")
-                f.write("-" * 60 + "\n")
+        # Build the whole file in memory, then write it in one call
+        separator = "-" * 60
+        chunks = [f"Model: {self.model_name}\nSystem: {self.system_prompt}\n{'=' * 60}\n\n"]
+        for entry in self.conversation_history:
+            timestamp = datetime.fromtimestamp(entry['ts']).isoformat()
+            chunks.append(
+                f"[{timestamp}]\nUser: {entry['user']}\nBot: {entry['bot']}\n{separator}\n"
+            )
+        with open(filename, 'w', buffering=1 << 16) as f:
+            f.write("".join(chunks))
     
     @classmethod
     def list_supported_models(cls) -> Dict[str, List[str]]:
@@ -336,6 +766,45 @@ def print_models():
     print("-" * 70)
 
 
+def clear_history(chatbot: GenericChatbot):
+    """Handle the 'clear' command"""
+    chatbot.clear_history()
+    print("✅ Conversation history cleared!")
+
+
+def show_history(chatbot: GenericChatbot):
+    """Handle the 'history' command"""
+    history = chatbot.get_history()
+    if not history:
+        print("No conversation history yet.")
+        return
+    print("\n📜 Conversation History:")
+    print("-" * 60)
+    for entry in history:
+        print(f"[{entry['timestamp']}]")
+        print(f"You: {entry['user']}")
+        print(f"Bot: {entry['bot'][:100]}...")
+        print()
+
+
+def save_history(chatbot: GenericChatbot):
+    """Handle the 'save' command"""
+    filename = f"chat_history_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+    chatbot.save_history_to_file(filename)
+    print(f"✅ Conversation saved to {filename}")
+
+
+# Chat commands -> handler(chatbot). Built once, looked up with a single dict access.
+COMMANDS = {
+    'help': lambda chatbot: print_welcome(),
+    'clear': clear_history,
+    'history': show_history,
+    'save': save_history,
+    'models': lambda chatbot: print_models(),
+}
+EXIT_COMMANDS = frozenset({'quit', 'exit', 'bye'})
+
+
 def main():
     """Main function to run the chatbot"""
     # Get model from command line or use default
@@ -366,41 +835,13 @@ def main():
                 # Handle commands
                 command = user_input.lower()
                 
-                if command in ['quit', 'exit', 'bye']:
+                if command in EXIT_COMMANDS:
                     print("\n👋 Thank you for chatting! Goodbye!")
                     break
                 
-                if command == 'help':
-                    print_welcome()
-                    continue
-                
-                if command == 'clear':
-                    chatbot.clear_history()
-                    print("✅ Conversation history cleared!")
-                    continue
-                
-                if command == 'history':
-                    history = chatbot.get_history()
-                    if not history:
-                        print("No conversation history yet.")
-                    else:
-                        print("\n📜 Conversation History:")
-                        print("-" * 60)
-                        for entry in history:
-                            print(f"[{entry['timestamp']}]")
-                            print(f"You: {entry['user']}")
-                            print(f"Bot: {entry['bot'][:100]}...")
-                            print()
-                    continue
-                
-                if command == 'save':
-                    filename = f"chat_history_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
-                    chatbot.save_history_to_file(filename)
-                    print(f"✅ Conversation saved to {filename}")
-                    continue
-                
-                if command == 'models':
-                    print_models()
+                handler = COMMANDS.get(command)
+                if handler:
+                    handler(chatbot)
                     continue
                 
                 if command.startswith('switch '):
@@ -414,9 +855,11 @@ def main():
                         print(f"❌ Failed to switch model: {e}")
                     continue
                 
-                # Generate response
-                response = chatbot.generate_response(user_input)
-                print(f"\n🤖 Bot: {response}")
+                # Stream the response so text appears as soon as it's generated
+                print("\n🤖 Bot: ", end="", flush=True)
+                for piece in chatbot.generate_stream(user_input):
+                    print(piece, end="", flush=True)
+                print()
             
             except ValueError as e:
                 print(f"❌ Invalid input: {e}")
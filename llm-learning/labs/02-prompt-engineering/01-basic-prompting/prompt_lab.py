@@ -163,8 +163,11 @@ TEMPERATURES = [0.0, 0.7, 1.0]  # Try changing these!
 #     'gemini-2.5-flash',
 #     system_instruction=SYSTEM_INSTRUCTION_CLASSIFIER
 # )
-# for text in ZERO_SHOT_TESTS:
-#     response = model_classifier.generate_content(text)
+# # The texts are independent, so send them all at once instead of one by one
+# from concurrent.futures import ThreadPoolExecutor
+# with ThreadPoolExecutor(max_workers=len(ZERO_SHOT_TESTS)) as pool:
+#     responses = pool.map(model_classifier.generate_content, ZERO_SHOT_TESTS)
+# for text, response in zip(ZERO_SHOT_TESTS, responses):
 #     print(f"'{text}' → {response.text}")
 
 # Uncomment below to try Pattern 2: Few-Shot
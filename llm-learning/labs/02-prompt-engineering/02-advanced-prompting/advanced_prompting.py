@@ -18,30 +18,35 @@ Usage:
 """
 
 import os
+import re
 import sys
 import json
-from typing import Dict, Any, Optional
+import time
+import httpx
+import orjson
+import asyncio
+import hashlib
+import datetime
+import threading
+from time import perf_counter_ns
+from functools import lru_cache
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+from pathlib import Path
+from diskcache import Cache
 from dotenv import load_dotenv
+import google.generativeai as genai
+from google.generativeai import caching
+from google.api_core import exceptions as google_exceptions
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_google_genai import ChatGoogleGenerativeAI
-
-try:
-    from langchain_openai import ChatOpenAI
-except ImportError:
-    ChatOpenAI = None
-
-try:
-    from langchain_anthropic import ChatAnthropic
-except ImportError:
-    ChatAnthropic = None
-
-try:
-    from langchain_ollama import ChatOllama
-except ImportError:
-    ChatOllama = None
+# OpenAI / Anthropic / Ollama packages are imported lazily in
+# _initialize_llm, so the default Gemini path doesn't pay their import time
 
 from prompt_templates import PromptLibrary
 
+# Load .env once at import time
+load_dotenv()
+
 # ============================================================================
 # CONFIGURATION PRESETS
 # ============================================================================
@@ -64,31 +69,137 @@ CONFIGS = {
     }
 }
 
+# JSON templates: stop at a closing code fence or a run of blank lines
+# instead of letting the model keep writing after the object.
+# Anthropic rejects whitespace-only stop sequences, so Claude gets only
+# the non-blank ones (see _config_for_template).
+JSON_STOP_SEQUENCES = ["\n```", "\n\n\n"]
+
+# Smallest thinking_budget each Gemini model accepts (0 = thinking can be
+# turned off). Matched by name prefix; models not listed get no budget.
+GEMINI_MIN_THINKING_BUDGET = {
+    "gemini-2.5-pro": 128,
+    "gemini-2.5-flash": 0,
+    "gemini-2.5-flash-lite": 0,
+}
+
+# Shared HTTP pool for httpx-based clients (OpenAI): keep-alive connections
+# let batch and concurrent requests skip the TCP + TLS handshake after the first
+HTTP_LIMITS = httpx.Limits(max_keepalive_connections=32, max_connections=64)
+HTTP_TIMEOUT = 30.0
+_http_client: Optional[httpx.Client] = None
+_http_async_client: Optional[httpx.AsyncClient] = None
+# Async clients are bound to the event loop that first uses them, so every
+# async call runs on this one loop (see _get_async_loop)
+_async_loop: Optional[asyncio.AbstractEventLoop] = None
+_async_loop_lock = threading.Lock()
+
+# Local cache of deterministic (temperature=0) results
+RESPONSE_CACHE_DIR = Path(__file__).parent / ".llm_cache"
+RESPONSE_CACHE_TTL_SECONDS = 24 * 60 * 60
+
+# How long Gemini keeps a cached system instruction on the server
+PROMPT_CACHE_TTL = datetime.timedelta(minutes=10)
+# Gemini refuses to cache content below this many tokens (1024 on 2.5 Flash,
+# more on Pro); shorter system prompts skip the cache call entirely
+PROMPT_CACHE_MIN_TOKENS = 1024
+
+
+def _get_http_clients() -> Tuple[httpx.Client, httpx.AsyncClient]:
+    """Return the shared (sync, async) HTTP/2 clients, creating them on first use"""
+    global _http_client, _http_async_client
+    if _http_client is None:
+        _http_client = httpx.Client(http2=True, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+        _http_async_client = httpx.AsyncClient(http2=True, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+    return _http_client, _http_async_client
+
+
+def _get_async_loop() -> asyncio.AbstractEventLoop:
+    """Return the shared event loop (running in a daemon thread), starting it on first use"""
+    global _async_loop
+    with _async_loop_lock:
+        if _async_loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, daemon=True).start()
+            _async_loop = loop
+    return _async_loop
+
+
+def _min_thinking_budget(model_name: str) -> Optional[int]:
+    """Smallest thinking_budget a Gemini model accepts, or None to leave it unset"""
+    # Longest prefix first, so "gemini-2.5-flash-lite" isn't read as "gemini-2.5-flash"
+    for prefix in sorted(GEMINI_MIN_THINKING_BUDGET, key=len, reverse=True):
+        if model_name.startswith(prefix):
+            return GEMINI_MIN_THINKING_BUDGET[prefix]
+    return None
+
+
+@lru_cache(maxsize=16)
+def _get_gemini_llm(
+    model_name: str,
+    temperature: float,
+    max_tokens: int,
+    cached_content: Optional[str] = None,
+    thinking_budget: Optional[int] = None
+) -> ChatGoogleGenerativeAI:
+    """
+    Return a Gemini client for these settings, built once and then reused
+    
+    Building a client sets up auth and a network channel, so reusing one
+    per (model, temperature, max_tokens, cache, thinking) avoids repeating that work.
+    """
+    # thinking_budget=None keeps the model's default thinking
+    extra = {} if thinking_budget is None else {"thinking_budget": thinking_budget}
+    return ChatGoogleGenerativeAI(
+        model=model_name,
+        google_api_key=os.getenv("GEMINI_API_KEY"),
+        temperature=temperature,
+        max_output_tokens=max_tokens,
+        cached_content=cached_content,
+        **extra
+    )
+
 # ============================================================================
 # INPUT VALIDATOR
 # ============================================================================
 
+# Known prompt-injection phrases (matched case-insensitively, any whitespace between words)
+INJECTION_PATTERNS = [
+    "ignore previous instructions",
+    "ignore all previous instructions",
+    "disregard previous instructions",
+    "disregard above",
+]
+
 class InputValidator:
     """Validates user inputs"""
     
+    # All patterns compiled once into one regex, so each value is scanned once
+    # no matter how many patterns there are. IGNORECASE does the case folding
+    # inside the regex engine (no lowercased copy of the value), and \s+ also
+    # catches "ignore   previous\ninstructions".
+    _INJECTION_RE = re.compile(
+        "|".join(
+            r"\s+".join(re.escape(word) for word in pattern.split())
+            for pattern in INJECTION_PATTERNS
+        ),
+        re.IGNORECASE
+    )
+    
     @staticmethod
-    def validate_variables(variables: Dict[str, Any], required_fields: list) -> Dict[str, Any]:
-        """Validate that all required fields are present"""
-        # Check all required fields exist
-        missing = [f for f in required_fields if f not in variables]
+    def validate_variables(variables: Dict[str, Any], required_fields: Iterable[str]) -> Dict[str, Any]:
+        """Validate that all required fields are present, non-empty and injection-free"""
+        # Check all required fields exist (set difference, no Python loop)
+        missing = frozenset(required_fields).difference(variables)
         if missing:
-            raise ValueError(f"Missing required fields: {missing}")
+            raise ValueError(f"Missing required fields: {sorted(missing)}")
         
-        # Check no empty values
-        empty = [k for k, v in variables.items() if not str(v).strip()]
-        if empty:
-            raise ValueError(f"Empty values for fields: {empty}")
-        
-        # Check for prompt injection
+        # One pass over the values: stop at the first empty or suspicious one
         for key, value in variables.items():
-            if isinstance(value, str):
-                if "ignore previous instructions" in value.lower():
-                    raise ValueError(f"Suspicious input detected in '{key}'")
+            if not str(value).strip():
+                raise ValueError(f"Empty value for field: '{key}'")
+            if isinstance(value, str) and InputValidator._INJECTION_RE.search(value):
+                raise ValueError(f"Suspicious input detected in '{key}'")
         
         return variables
 
@@ -130,8 +241,8 @@ class OutputValidator:
         cleaned_response = OutputValidator.clean_json_response(response)
         
         try:
-            data = json.loads(cleaned_response)
-        except json.JSONDecodeError as e:
+            data = orjson.loads(cleaned_response)
+        except orjson.JSONDecodeError as e:
             raise ValueError(f"Invalid JSON response: {e}")
         
         if required_fields:
@@ -141,6 +252,59 @@ class OutputValidator:
         
         return data
 
+# ============================================================================
+# SEMANTIC CACHE
+# ============================================================================
+
+class SemanticCache:
+    """
+    Reuses results for *similar* (not just identical) inputs
+    
+    Each input is embedded locally; if a stored input is close enough
+    (cosine similarity >= threshold), its result is returned instead of
+    calling the LLM. "Reset my password?" and "How do I reset my password"
+    then share one answer.
+    
+    Requires: pip install sentence-transformers faiss-cpu
+    """
+    
+    def __init__(self, threshold: float = 0.92, embedding_model: str = "all-MiniLM-L6-v2"):
+        try:
+            import faiss
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            raise ImportError("Install: pip install sentence-transformers faiss-cpu")
+        
+        self._faiss = faiss
+        self.threshold = threshold
+        self.embedder = SentenceTransformer(embedding_model)
+        self.dimension = self.embedder.get_sentence_embedding_dimension()
+        # One index per scope (template + config), so answers never cross templates
+        self._indexes: Dict[str, Any] = {}
+        self._results: Dict[str, List[Dict[str, Any]]] = {}
+    
+    def embed(self, text: str):
+        """Return a normalized embedding (inner product == cosine similarity)"""
+        return self.embedder.encode([text], normalize_embeddings=True).astype("float32")
+    
+    def lookup(self, scope: str, embedding) -> Optional[Dict[str, Any]]:
+        """Return the stored result for the most similar input, if similar enough"""
+        index = self._indexes.get(scope)
+        if index is None or index.ntotal == 0:
+            return None
+        scores, ids = index.search(embedding, 1)
+        if scores[0][0] >= self.threshold:
+            return self._results[scope][ids[0][0]]
+        return None
+    
+    def add(self, scope: str, embedding, result: Dict[str, Any]):
+        """Store a result for future similar inputs"""
+        if scope not in self._indexes:
+            self._indexes[scope] = self._faiss.IndexFlatIP(self.dimension)
+            self._results[scope] = []
+        self._indexes[scope].add(embedding)
+        self._results[scope].append(result)
+
 # ============================================================================
 # PRODUCTION PROMPT SYSTEM
 # ============================================================================
@@ -157,29 +321,51 @@ class AdvancedPromptSystem:
     - Multi-model support
     """
     
-    def __init__(self, model_name: str = "gemini-2.5-flash"):
+    def __init__(self, model_name: str = "gemini-2.5-flash", semantic_cache: bool = False):
+        """
+        Args:
+            model_name: Model to use (e.g., "gemini-2.5-flash", "gpt-4")
+            semantic_cache: Reuse results for similar inputs on non-zero
+                            temperature presets (needs sentence-transformers + faiss)
+        """
         self.model_name = model_name
+        self.semantic_cache = SemanticCache() if semantic_cache else None
         self.prompt_library = PromptLibrary()
         self.input_validator = InputValidator()
         self.output_validator = OutputValidator()
+        self.cache = Cache(str(RESPONSE_CACHE_DIR))
+        # Set to False if the provider can't do native structured output
+        self._structured_output_supported = True
+        # Gemini server-side caches: key -> (cache name or None, expiry time)
+        self._cache_handles: Dict[str, Tuple[Optional[str], float]] = {}
         self.llm = self._initialize_llm(model_name)
     
     def _initialize_llm(self, model_name: str):
-        """Initialize LLM based on model name"""
-        load_dotenv()
-        
+        """Initialize LLM based on model name (imports the provider package on demand)"""
         if "gpt" in model_name.lower():
-            if not ChatOpenAI:
+            try:
+                from langchain_openai import ChatOpenAI
+            except ImportError:
                 raise ImportError("Install: pip install langchain-openai")
-            return ChatOpenAI(model=model_name, api_key=os.getenv("OPENAI_API_KEY"))
+            http_client, http_async_client = _get_http_clients()
+            return ChatOpenAI(
+                model=model_name,
+                api_key=os.getenv("OPENAI_API_KEY"),
+                http_client=http_client,
+                http_async_client=http_async_client
+            )
         
         elif "claude" in model_name.lower():
-            if not ChatAnthropic:
+            try:
+                from langchain_anthropic import ChatAnthropic
+            except ImportError:
                 raise ImportError("Install: pip install langchain-anthropic")
             return ChatAnthropic(model=model_name, api_key=os.getenv("ANTHROPIC_API_KEY"))
         
         elif "ollama" in model_name.lower():
-            if not ChatOllama:
+            try:
+                from langchain_ollama import ChatOllama
+            except ImportError:
                 raise ImportError("Install: pip install langchain-ollama")
             model = model_name.split("/")[1] if "/" in model_name else model_name
             return ChatOllama(model=model)
@@ -188,6 +374,7 @@ class AdvancedPromptSystem:
             api_key = os.getenv("GEMINI_API_KEY")
             if not api_key:
                 raise ValueError("GEMINI_API_KEY not found in .env")
+            genai.configure(api_key=api_key)  # Used for context caching
             return ChatGoogleGenerativeAI(model=model_name, google_api_key=api_key)
     
     def generate(
@@ -196,7 +383,8 @@ class AdvancedPromptSystem:
         variables: Dict[str, Any],
         config_name: str = "balanced",
         validate_output: bool = False,
-        required_output_fields: Optional[list] = None
+        required_output_fields: Optional[list] = None,
+        stream: bool = False
     ) -> Dict[str, Any]:
         """
         Generate response using template
@@ -207,6 +395,8 @@ class AdvancedPromptSystem:
             config_name: Config preset ("factual", "balanced", "creative")
             validate_output: If True, validate JSON output
             required_output_fields: Required fields in JSON output
+            stream: If True, print tokens to stdout as they arrive
+                    (JSON validation runs once the stream ends)
         
         Returns:
             Dict with response, metadata, and optional parsed JSON
@@ -216,45 +406,330 @@ class AdvancedPromptSystem:
         if not template:
             raise ValueError(f"Template '{template_name}' not found")
         
-        # Get required variables for this template
-        required_vars = template.input_variables
+        # Get required variables for this template (precomputed frozenset)
+        required_vars = self.prompt_library.get_required_variables(template_name)
         
         # Validate input variables
         self.input_validator.validate_variables(variables, required_vars)
         
-        # Get config
-        config = CONFIGS.get(config_name, CONFIGS["balanced"])
+        # Get config (tightened to this template's expected output size)
+        config = self._config_for_template(
+            CONFIGS.get(config_name, CONFIGS["balanced"]), template_name
+        )
         
         # Format prompt (system + user message)
-        messages = template.format_messages(**variables)
+        messages = self.prompt_library.format_messages(template_name, variables)
+        
+        # temperature=0 is deterministic: identical requests can reuse the result
+        cache_key = None
+        if config["temperature"] == 0.0:
+            cache_key = hashlib.sha256(json.dumps([
+                self.model_name,
+                [(m.type, m.content) for m in messages],
+                config,
+                validate_output,
+                required_output_fields,
+            ]).encode("utf-8")).hexdigest()
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                cached["metadata"]["cache"] = "hit"
+                cached["metadata"]["latency_ms"] = 0
+                if stream and "parsed_json" not in cached:
+                    print(cached["response"])
+                return cached
+        
+        # Other presets: optionally reuse the result of a very similar input
+        semantic_scope = semantic_embedding = None
+        if cache_key is None and self.semantic_cache:
+            semantic_scope = json.dumps(
+                [template_name, config_name, validate_output, required_output_fields]
+            )
+            user_text = "\n".join(str(variables[k]) for k in sorted(variables))
+            semantic_embedding = self.semantic_cache.embed(user_text)
+            similar = self.semantic_cache.lookup(semantic_scope, semantic_embedding)
+            if similar is not None:
+                result = {
+                    **similar,
+                    "metadata": {**similar["metadata"], "cache": "semantic hit", "latency_ms": 0},
+                }
+                if stream and "parsed_json" not in result:
+                    print(result["response"])
+                return result
         
         # Generate response
         print(f"\n🔄 Generating with {self.model_name} (config: {config_name})...")
-        import time
-        start = time.time()
+        start = perf_counter_ns()  # Monotonic, nanosecond resolution
+        
+        messages, cached_content = self._apply_prompt_cache(messages)
+        llm, invoke_kwargs = self._llm_for_config(config, cached_content)
+        
+        # JSON templates: let the provider return schema-valid JSON directly
+        parsed = None
+        output_schema = self.prompt_library.get_template_info(template_name)["output_schema"]
+        if validate_output and output_schema and self._structured_output_supported:
+            parsed = self._invoke_structured(llm, messages, invoke_kwargs, output_schema)
+        
+        if parsed is not None:
+            response_text = orjson.dumps(parsed).decode("utf-8")
+        elif stream:
+            # Show text as soon as the model produces it
+            pieces = []
+            first_token_ms = None
+            for chunk in llm.stream(messages, **invoke_kwargs):
+                if first_token_ms is None:
+                    first_token_ms = (perf_counter_ns() - start) // 1_000_000
+                sys.stdout.write(chunk.content)
+                sys.stdout.flush()
+                pieces.append(chunk.content)
+            sys.stdout.write("\n")
+            response_text = "".join(pieces)
+        else:
+            response = llm.invoke(messages, **invoke_kwargs)
+            response_text = response.content
+        
+        latency_ms = (perf_counter_ns() - start) // 1_000_000
+        
+        result = self._build_result(
+            response_text, template_name, config_name, latency_ms,
+            validate_output, required_output_fields, parsed
+        )
+        if stream and parsed is None and first_token_ms is not None:
+            result["metadata"]["ttft_ms"] = first_token_ms
+        if cache_key:
+            self.cache.set(cache_key, result, expire=RESPONSE_CACHE_TTL_SECONDS)
+        elif semantic_scope is not None:
+            self.semantic_cache.add(semantic_scope, semantic_embedding, result)
+        return result
+    
+    def generate_batch(
+        self,
+        template_name: str,
+        variables_list: List[Dict[str, Any]],
+        config_name: str = "balanced",
+        validate_output: bool = False,
+        required_output_fields: Optional[list] = None,
+        max_concurrency: int = 8
+    ) -> List[Dict[str, Any]]:
+        """
+        Generate responses for many inputs in parallel using one template
+        
+        Uses LangChain's llm.batch(), which sends the requests concurrently,
+        so N inputs take about as long as the slowest one instead of N calls
+        one after another.
+        
+        Args:
+            template_name: Name of template (e.g., "sentiment_v3")
+            variables_list: One variables dict per input
+            config_name: Config preset ("factual", "balanced", "creative")
+            validate_output: If True, validate JSON output
+            required_output_fields: Required fields in JSON output
+            max_concurrency: Maximum requests in flight at once
+        
+        Returns:
+            One result dict per input (same shape as generate()), in order
+        """
+        # Validate everything before sending anything
+        required_vars = self.prompt_library.get_required_variables(template_name)
+        for variables in variables_list:
+            self.input_validator.validate_variables(variables, required_vars)
+        
+        config = self._config_for_template(
+            CONFIGS.get(config_name, CONFIGS["balanced"]), template_name
+        )
+        messages_list = [
+            self.prompt_library.format_messages(template_name, variables)
+            for variables in variables_list
+        ]
+        
+        print(f"\n🔄 Generating {len(messages_list)} responses with {self.model_name} "
+              f"(config: {config_name})...")
+        start = perf_counter_ns()  # Monotonic, nanosecond resolution
+        
+        # All inputs share the template's system message, so one cache serves the batch
+        cached_content = None
+        for i, messages in enumerate(messages_list):
+            messages_list[i], cached_content = self._apply_prompt_cache(messages)
+        llm, invoke_kwargs = self._llm_for_config(config, cached_content)
+        responses = llm.batch(
+            messages_list,
+            config={"max_concurrency": max_concurrency},
+            **invoke_kwargs
+        )
+        
+        latency_ms = (perf_counter_ns() - start) // 1_000_000
+        
+        return [
+            self._build_result(
+                response.content, template_name, config_name, latency_ms,
+                validate_output, required_output_fields
+            )
+            for response in responses
+        ]
+    
+    def _apply_prompt_cache(self, messages: list) -> Tuple[list, Optional[str]]:
+        """
+        Let the provider reuse the (static) system message between calls
+        
+        - Gemini: upload the system instruction once as cached content and
+          send only the user messages. Returns the cache name to pass to
+          the client. Caches are keyed on model + system text, so templates
+          and configs that share a system message share one cache.
+        - Claude: mark the system block with cache_control so Anthropic
+          caches it server-side.
+        - Others: messages are returned unchanged.
+        
+        Returns:
+            (messages to send, Gemini cached content name or None)
+        """
+        if not messages or not isinstance(messages[0], SystemMessage):
+            return messages, None
+        system_text = messages[0].content
+        
+        if "claude" in self.model_name.lower():
+            cached_system = SystemMessage(content=[{
+                "type": "text",
+                "text": system_text,
+                "cache_control": {"type": "ephemeral"},
+            }])
+            return [cached_system] + messages[1:], None
+        
+        if "gemini" not in self.model_name.lower():
+            return messages, None
+        # Too short to cache (~4 chars per token): don't spend a round-trip on it
+        if len(system_text) // 4 < PROMPT_CACHE_MIN_TOKENS:
+            return messages, None
+        
+        key = hashlib.sha256(
+            json.dumps([self.model_name, system_text]).encode("utf-8")
+        ).hexdigest()
+        cache_name, expires_at = self._cache_handles.get(key, (None, 0.0))
         
-        # Handle different LLM APIs
+        if time.monotonic() >= expires_at:
+            try:
+                handle = caching.CachedContent.create(
+                    model=f"models/{self.model_name}",
+                    system_instruction=system_text,
+                    ttl=PROMPT_CACHE_TTL,
+                )
+                cache_name = handle.name
+            except google_exceptions.InvalidArgument as e:
+                # The estimate can undercount; Gemini then reports the content
+                # as too small, so just send the full messages instead
+                if "too small" not in str(e).lower():
+                    raise
+                cache_name = None
+            # Refresh a little before the server-side TTL runs out
+            expires_at = time.monotonic() + PROMPT_CACHE_TTL.total_seconds() - 30
+            self._cache_handles[key] = (cache_name, expires_at)
+        
+        if cache_name is None:
+            return messages, None
+        return messages[1:], cache_name
+    
+    def _config_for_template(self, config: Dict[str, Any], template_name: str) -> Dict[str, Any]:
+        """
+        Tighten a config preset to what the template actually needs
+        
+        Decoding is the slow part of a call, so templates with short outputs
+        (labels, small JSON objects) set max_output_tokens in templates.json
+        and JSON templates ("output_format": "json") get stop sequences to
+        end generation early.
+        
+        Gemini 2.5 counts thinking tokens against max_output_tokens, so a
+        tight cap would leave little or nothing for the answer; capped
+        templates therefore use the model's smallest thinking budget (0 =
+        off where allowed) and raise the cap by that budget.
+        """
+        info = self.prompt_library.get_template_info(template_name)
+        model = self.model_name.lower()
+        effective = dict(config)
+        if info.get("max_output_tokens"):
+            effective["max_tokens"] = min(config["max_tokens"], info["max_output_tokens"])
+            min_budget = _min_thinking_budget(model)
+            if min_budget is not None:
+                effective["thinking_budget"] = min_budget
+                effective["max_tokens"] += min_budget
+        if info.get("output_format") == "json":
+            stops = JSON_STOP_SEQUENCES
+            if "claude" in model:
+                stops = [stop for stop in stops if stop.strip()]
+            effective["stop"] = stops
+        return effective
+    
+    def _llm_for_config(self, config: Dict[str, Any], cached_content: Optional[str] = None):
+        """
+        Return (llm, invoke_kwargs) that apply a config preset
+        
+        Gemini needs a client built with the config (and the cached system
+        instruction, if any); other providers accept temperature/max_tokens
+        as invoke() parameters.
+        """
         if "gemini" in self.model_name.lower():
-            # Gemini: Need to reinitialize with config parameters
-            api_key = os.getenv("GEMINI_API_KEY")
-            llm_with_config = ChatGoogleGenerativeAI(
-                model=self.model_name,
-                google_api_key=api_key,
-                temperature=config["temperature"],
-                max_output_tokens=config["max_tokens"]
+            # Gemini: Needs a client built with config parameters (pooled)
+            llm_with_config = _get_gemini_llm(
+                self.model_name,
+                config["temperature"],
+                config["max_tokens"],
+                cached_content,
+                config.get("thinking_budget")
             )
-            response = llm_with_config.invoke(messages)
+            invoke_kwargs = {}
         else:
             # OpenAI, Anthropic, Ollama: Pass parameters in invoke()
-            response = self.llm.invoke(
-                messages,
-                temperature=config["temperature"],
-                max_tokens=config["max_tokens"]
-            )
+            llm_with_config = self.llm
+            invoke_kwargs = {
+                "temperature": config["temperature"],
+                "max_tokens": config["max_tokens"]
+            }
         
-        latency = time.time() - start
-        response_text = response.content
+        # Stop sequences are a standard invoke() parameter for every provider
+        if config.get("stop"):
+            invoke_kwargs["stop"] = config["stop"]
+        return llm_with_config, invoke_kwargs
+    
+    def _invoke_structured(
+        self,
+        llm,
+        messages: list,
+        invoke_kwargs: Dict[str, Any],
+        output_schema: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Ask the model for JSON matching the template's output_schema
         
+        Uses LangChain's with_structured_output() (Gemini response schema,
+        OpenAI function calling, Claude tool use), so the reply is already
+        valid JSON - no markdown fences to strip, no parse failures. The
+        schema lists every field the template documents, with real types
+        and enums, so nothing the prompt promises is dropped.
+        
+        Returns:
+            Parsed dict, or None if structured output isn't supported
+            (the caller then falls back to plain text + validate_json)
+        """
+        # Stop sequences are for free-text JSON; the schema already bounds the output
+        invoke_kwargs = {k: v for k, v in invoke_kwargs.items() if k != "stop"}
+        try:
+            structured_llm = llm.with_structured_output(output_schema)
+        except (NotImplementedError, TypeError, ValueError):
+            # The provider/model can't do structured output: stop trying for this session
+            self._structured_output_supported = False
+            return None
+        # Request errors (timeouts, rate limits, auth) propagate like any other call
+        # A dict schema comes back as a plain dict
+        return structured_llm.invoke(messages, **invoke_kwargs)
+    
+    def _build_result(
+        self,
+        response_text: str,
+        template_name: str,
+        config_name: str,
+        latency_ms: int,
+        validate_output: bool,
+        required_output_fields: Optional[list],
+        parsed: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Package a response with metadata, validating JSON if requested"""
         # Prepare result
         result = {
             "response": response_text,
@@ -262,12 +737,16 @@ class AdvancedPromptSystem:
                 "template": template_name,
                 "config": config_name,
                 "model": self.model_name,
-                "latency_ms": int(latency * 1000)
+                "latency_ms": latency_ms
             }
         }
         
         # Validate output if requested
-        if validate_output:
+        if parsed is not None:
+            # Structured output already matches the schema
+            result["parsed_json"] = parsed
+            result["metadata"]["validation"] = "✅ passed (structured output)"
+        elif validate_output:
             try:
                 parsed = self.output_validator.validate_json(
                     response_text,
@@ -301,8 +780,11 @@ class AdvancedPromptSystem:
         Returns:
             Dict with response and A/B test info
         """
-        # Assign user to version (deterministic based on user_id)
-        version_idx = hash(user_id) % len(versions)
+        # Assign user to version (deterministic based on user_id).
+        # Built-in hash() is randomized per process, so use a stable hash to
+        # keep each user in the same group across restarts.
+        digest = hashlib.blake2b(user_id.encode("utf-8"), digest_size=8).digest()
+        version_idx = int.from_bytes(digest, "big") % len(versions)
         assigned_version = versions[version_idx]
         template_name = f"{base_template}_{assigned_version}"
         
@@ -324,6 +806,78 @@ class AdvancedPromptSystem:
         }
         
         return result
+    
+    def ab_test_compare(
+        self,
+        user_id: str,
+        base_template: str,
+        variables: Dict[str, Any],
+        versions: list = ["v2", "v3"],
+        config_name: str = "balanced"
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Run every template version on the same input, concurrently
+        
+        For offline evaluation: instead of assigning one version, all versions
+        are called at the same time, so the total wait is the slowest version
+        rather than the sum of all of them.
+        
+        Args:
+            user_id: User identifier (recorded in each result)
+            base_template: Base template name (e.g., "sentiment")
+            variables: Variables for template
+            versions: Versions to compare (e.g., ["v2", "v3"])
+            config_name: Config preset
+        
+        Returns:
+            Dict mapping version -> result (same shape as generate())
+        """
+        async def run_all():
+            return await asyncio.gather(*[
+                self._ainvoke_version(f"{base_template}_{version}", variables, config_name)
+                for version in versions
+            ])
+        
+        print(f"\n🧪 Comparing {', '.join(versions)} for user '{user_id}'...")
+        results = asyncio.run_coroutine_threadsafe(run_all(), _get_async_loop()).result()
+        
+        for idx, (version, result) in enumerate(zip(versions, results)):
+            result["ab_test_info"] = {
+                "user_id": user_id,
+                "assigned_version": version,
+                "test_group": chr(65 + idx)  # A, B, C, etc.
+            }
+        return dict(zip(versions, results))
+    
+    async def _ainvoke_version(
+        self,
+        template_name: str,
+        variables: Dict[str, Any],
+        config_name: str
+    ) -> Dict[str, Any]:
+        """Async generate() for one template version (with JSON validation)"""
+        self.input_validator.validate_variables(
+            variables, self.prompt_library.get_required_variables(template_name)
+        )
+        config = self._config_for_template(
+            CONFIGS.get(config_name, CONFIGS["balanced"]), template_name
+        )
+        
+        messages = self.prompt_library.format_messages(template_name, variables)
+        # Creating a Gemini cache is a blocking call: keep it off the event loop
+        messages, cached_content = await asyncio.get_running_loop().run_in_executor(
+            None, self._apply_prompt_cache, messages
+        )
+        llm, invoke_kwargs = self._llm_for_config(config, cached_content)
+        
+        start = perf_counter_ns()
+        response = await llm.ainvoke(messages, **invoke_kwargs)
+        latency_ms = (perf_counter_ns() - start) // 1_000_000
+        
+        return self._build_result(
+            response.content, template_name, config_name, latency_ms,
+            validate_output=True, required_output_fields=None
+        )
 
 # ============================================================================
 # INTERACTIVE MENU
@@ -372,6 +926,54 @@ def get_config_choice() -> str:
     config_map = {"1": "factual", "2": "balanced", "3": "creative"}
     return config_map.get(choice, "balanced")
 
+def _emit(lines: List[str]):
+    """Write a block of output lines at once (one write + flush instead of one print per line)"""
+    sys.stdout.write("\n".join(lines) + "\n")
+    sys.stdout.flush()
+
+def _result_lines(
+    result: Dict[str, Any],
+    text: Optional[str] = None,
+    show_response: bool = False,
+    detailed: bool = False,
+    show_metadata: bool = True
+) -> List[str]:
+    """
+    Build the lines of a RESULT block for a generate() result
+    
+    detailed=True also lists the model, time to first token and validation.
+    """
+    out = ["\n" + "=" * 70, "✅ RESULT", "=" * 70]
+    
+    if text is not None:
+        out.append(f"Text: {text}\n")
+    
+    if "parsed_json" in result:
+        out.append(orjson.dumps(result["parsed_json"], option=orjson.OPT_INDENT_2).decode("utf-8"))
+    elif show_response:
+        out.append(result["response"])
+    
+    if not show_metadata:
+        return out
+    
+    metadata = result["metadata"]
+    out.append("\n📊 Metadata:")
+    out.append(f"  Template: {metadata['template']}")
+    out.append(f"  Config: {metadata['config']}")
+    if detailed:
+        out.append(f"  Model: {metadata['model']}")
+    out.append(f"  Latency: {metadata['latency_ms']}ms")
+    if detailed:
+        if "ttft_ms" in metadata:
+            out.append(f"  First token: {metadata['ttft_ms']}ms")
+        if "validation" in metadata:
+            out.append(f"  Validation: {metadata['validation']}")
+            # If validation failed, show raw response for debugging
+            if "failed" in metadata["validation"] and "parsed_json" not in result:
+                out.append("\n🔍 Debug - Raw Response:")
+                out.append(f"  {result['response'][:200]}...")  # First 200 chars
+    return out
+
 def customer_support_flow(system: AdvancedPromptSystem):
     """Customer support use case"""
     print("\n" + "=" * 70)
@@ -413,30 +1015,12 @@ def customer_support_flow(system: AdvancedPromptSystem):
             variables=variables,
             config_name=config_name,
             validate_output=should_validate,
-            required_output_fields=required_fields
+            required_output_fields=required_fields,
+            stream=True
         )
         
-        # Display result
-        print("\n" + "=" * 70)
-        print("✅ RESULT")
-        print("=" * 70)
-        
-        if "parsed_json" in result:
-            print(json.dumps(result["parsed_json"], indent=2))
-        else:
-            print(result["response"])
-        
-        print("\n📊 Metadata:")
-        print(f"  Template: {result['metadata']['template']}")
-        print(f"  Config: {result['metadata']['config']}")
-        print(f"  Model: {result['metadata']['model']}")
-        print(f"  Latency: {result['metadata']['latency_ms']}ms")
-        if "validation" in result["metadata"]:
-            print(f"  Validation: {result['metadata']['validation']}")
-            # If validation failed, show raw response for debugging
-            if "failed" in result["metadata"]["validation"] and "parsed_json" not in result:
-                print(f"\n🔍 Debug - Raw Response:")
-                print(f"  {result['response'][:200]}...")  # First 200 chars
+        # Display result (the raw response was already streamed above)
+        _emit(_result_lines(result, detailed=True))
     
     except Exception as e:
         print(f"\n❌ Error: {e}")
@@ -453,12 +1037,17 @@ def sentiment_analysis_flow(system: AdvancedPromptSystem):
     # Select config
     config_name = get_config_choice()
     
-    # Get user input with default
-    print("\nEnter text to analyze:")
-    text = input("Text [This product is amazing! Best purchase ever.]: ").strip() or "This product is amazing! Best purchase ever."
-    
-    # Prepare variables
-    variables = {"text": text}
+    # Get user input with default (several lines = several texts, analyzed in parallel)
+    print("\nEnter text to analyze (one per line, empty line to finish):")
+    texts = []
+    while True:
+        prompt = "Text [This product is amazing! Best purchase ever.]: " if not texts else "Text: "
+        line = input(prompt).strip()
+        if not line:
+            break
+        texts.append(line)
+    if not texts:
+        texts = ["This product is amazing! Best purchase ever."]
     
     # Only validate JSON for sentiment_v2 and sentiment_v3 (which output JSON)
     should_validate = template_name in ["sentiment_v2", "sentiment_v3"]
@@ -466,28 +1055,33 @@ def sentiment_analysis_flow(system: AdvancedPromptSystem):
     
     # Generate
     try:
-        result = system.generate(
-            template_name=template_name,
-            variables=variables,
-            config_name=config_name,
-            validate_output=should_validate,
-            required_output_fields=required_fields
-        )
-        
-        # Display result
-        print("\n" + "=" * 70)
-        print("✅ RESULT")
-        print("=" * 70)
-        
-        if "parsed_json" in result:
-            print(json.dumps(result["parsed_json"], indent=2))
+        if len(texts) == 1:
+            results = [system.generate(
+                template_name=template_name,
+                variables={"text": texts[0]},
+                config_name=config_name,
+                validate_output=should_validate,
+                required_output_fields=required_fields,
+                stream=True
+            )]
         else:
-            print(result["response"])
+            results = system.generate_batch(
+                template_name=template_name,
+                variables_list=[{"text": text} for text in texts],
+                config_name=config_name,
+                validate_output=should_validate,
+                required_output_fields=required_fields
+            )
         
-        print("\n📊 Metadata:")
-        print(f"  Template: {result['metadata']['template']}")
-        print(f"  Config: {result['metadata']['config']}")
-        print(f"  Latency: {result['metadata']['latency_ms']}ms")
+        # Display results (all of them in one write)
+        out = []
+        for text, result in zip(texts, results):
+            out += _result_lines(
+                result,
+                text=text if len(texts) > 1 else None,
+                show_response=len(texts) > 1  # A single response was streamed already
+            )
+        _emit(out)
     
     except Exception as e:
         print(f"\n❌ Error: {e}")
@@ -522,23 +1116,17 @@ def ab_testing_flow(system: AdvancedPromptSystem):
         )
         
         # Display result
-        print("\n" + "=" * 70)
-        print("✅ RESULT")
-        print("=" * 70)
-        
-        if "parsed_json" in result:
-            print(json.dumps(result["parsed_json"], indent=2))
-        else:
-            print(result["response"])
-        
-        print("\n🧪 A/B Test Info:")
-        print(f"  User ID: {result['ab_test_info']['user_id']}")
-        print(f"  Assigned Version: {result['ab_test_info']['assigned_version']}")
-        print(f"  Test Group: {result['ab_test_info']['test_group']}")
-        
-        print("\n📊 Metadata:")
-        print(f"  Template: {result['metadata']['template']}")
-        print(f"  Latency: {result['metadata']['latency_ms']}ms")
+        out = _result_lines(result, show_response=True, show_metadata=False)
+        out += [
+            "\n🧪 A/B Test Info:",
+            f"  User ID: {result['ab_test_info']['user_id']}",
+            f"  Assigned Version: {result['ab_test_info']['assigned_version']}",
+            f"  Test Group: {result['ab_test_info']['test_group']}",
+            "\n📊 Metadata:",
+            f"  Template: {result['metadata']['template']}",
+            f"  Latency: {result['metadata']['latency_ms']}ms",
+        ]
+        _emit(out)
     
     except Exception as e:
         print(f"\n❌ Error: {e}")
@@ -25,10 +25,97 @@ Usage:
     messages = template.format_messages(text="I love this!")
 """
 
+from __future__ import annotations
+
+import sys
 import json
+import logging
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import islice
 from pathlib import Path
-from typing import Dict, List, Optional
-from langchain_core.prompts import ChatPromptTemplate
+from string import Formatter
+from types import MappingProxyType
+from typing import (
+    TYPE_CHECKING, Any, Callable, Dict, FrozenSet, List, Mapping, Optional, Sequence, Set, Tuple
+)
+import fastjsonschema
+
+# langchain is imported only when a template is compiled or formatted, so
+# tools that just list or inspect templates don't pay for importing it
+if TYPE_CHECKING:
+    from langchain_core.messages import BaseMessage, SystemMessage
+    from langchain_core.prompts import ChatPromptTemplate
+
+# Library code logs instead of printing; callers choose what to show
+logger = logging.getLogger(__name__)
+
+# orjson parses the template file several times faster than json (and takes
+# bytes directly); its JSONDecodeError subclasses json.JSONDecodeError
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+# compile_all() uses threads only on free-threaded Python (no GIL) and only
+# when there are enough templates to outweigh starting the pool
+PARALLEL_COMPILE_MIN_TEMPLATES = 20
+
+# JSON role -> message prompt class in langchain_core.prompts, so compiling
+# skips from_messages' role dispatch
+_ROLE_PROMPT_CLASSES = {
+    "system": "SystemMessagePromptTemplate",
+    "user": "HumanMessagePromptTemplate",
+    "human": "HumanMessagePromptTemplate",
+    "assistant": "AIMessagePromptTemplate",
+    "ai": "AIMessagePromptTemplate",
+}
+
+# Structure of templates.json (extra keys are allowed)
+TEMPLATE_FILE_SCHEMA = {
+    "type": "object",
+    "additionalProperties": {
+        "type": "object",
+        "required": ["messages"],
+        "properties": {
+            "pattern": {"type": "string"},
+            "description": {"type": "string"},
+            "input_variables": {"type": "array", "items": {"type": "string"}},
+            "max_output_tokens": {"type": ["integer", "null"]},
+            "output_format": {"enum": ["text", "json"]},
+            "output_schema": {"type": "object", "required": ["title", "type", "properties"]},
+            "messages": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "required": ["role", "content"],
+                    "properties": {
+                        "role": {"type": "string"},
+                        "content": {
+                            "oneOf": [
+                                {"type": "string"},
+                                {"type": "array", "items": {"type": "string"}}
+                            ]
+                        }
+                    }
+                }
+            }
+        }
+    }
+}
+
+
+@lru_cache(maxsize=1)
+def _template_file_validator() -> Callable[[Any], Any]:
+    """Compile TEMPLATE_FILE_SCHEMA once (only needed when the JSON is parsed)."""
+    return fastjsonschema.compile(TEMPLATE_FILE_SCHEMA)
+
+
+def _placeholders(text: str) -> Set[str]:
+    """Return the {variable} names used in text ({{ and }} are literal braces)."""
+    return {field for _, field, _, _ in Formatter().parse(text) if field}
 
 
 class PromptLibrary:
@@ -38,7 +125,8 @@ class PromptLibrary:
     All templates follow production best practices:
       • Explicit system/user role separation
       • Format instructions in system role (security)
-      • Variable placeholders in user role
+      • Variable placeholders in user role only, so the system prompt is a
+        static prefix that providers can cache between calls
     """
     
     def __init__(self, template_file: str = "templates/templates.json"):
@@ -53,8 +141,28 @@ class PromptLibrary:
             json.JSONDecodeError: If template file is invalid JSON
             ValueError: If template structure is invalid
         """
-        self.templates: Dict[str, ChatPromptTemplate] = {}
-        self.template_metadata: Dict[str, Dict] = {}
+        # Compile cache: templates are compiled on first use (see get_template),
+        # so this holds only the ones used so far - use list_templates() for all
+        self._templates: Dict[str, ChatPromptTemplate] = {}
+        # Read-only views (MappingProxyType), safe to hand out without copying
+        self.template_metadata: Dict[str, Mapping[str, Any]] = {}
+        # (role, content) tuples per template, compiled only when needed
+        self._raw_messages: Dict[str, List[Tuple[str, str]]] = {}
+        # Original JSON entry per template (export_template writes it back out)
+        self._raw_template_json: Dict[str, Dict] = {}
+        # Variables each template needs, precomputed for O(1) checks
+        self.required_variables: Dict[str, FrozenSet[str]] = {}
+        # Declared "input_variables" per template as a frozenset (validate_variables)
+        self._declared_variables: Dict[str, FrozenSet[str]] = {}
+        # System + user templates: prebuilt system message and raw user string,
+        # so formatting only has to build the user message
+        self.system_messages: Dict[str, SystemMessage] = {}
+        self.user_templates: Dict[str, str] = {}
+        # Sorted names and category grouping, built on first use (reset on reload)
+        self._sorted_names: Optional[Tuple[str, ...]] = None
+        self._categories_cache: Optional[Dict[str, List[str]]] = None
+        # Memoized format() results, per instance (cleared on reload)
+        self._format_cached = lru_cache(maxsize=1024)(self._format_from_key)
         
         # Resolve path relative to this file's directory
         self.template_file = Path(__file__).parent / template_file
@@ -65,11 +173,15 @@ class PromptLibrary:
                 f"Expected location: {self.template_file.absolute()}"
             )
         
-        self._load_templates()
+        self._load_index()
     
-    def _load_templates(self):
+    def _load_index(self):
         """
-        Load all templates from JSON file.
+        Load the template index (metadata + raw messages) from JSON file.
+        
+        Templates are validated here but compiled into ChatPromptTemplate
+        objects only when first used (see _compile_template), so startup
+        cost doesn't grow with templates a session never touches.
         
         Expected JSON structure:
         {
@@ -77,6 +189,9 @@ class PromptLibrary:
                 "pattern": "Zero-Shot|Few-Shot|etc",
                 "description": "What this template does",
                 "input_variables": ["var1", "var2"],
+                "max_output_tokens": 64,  (optional)
+                "output_format": "json",  (optional, default "text")
+                "output_schema": {...},  (optional JSON Schema of the reply)
                 "messages": [
                     {
                         "role": "system",
@@ -91,8 +206,8 @@ class PromptLibrary:
           • Array: ["line 1", "line 2", "line 3"] (joined with newlines)
         """
         try:
-            with open(self.template_file, 'r', encoding='utf-8') as f:
-                template_data = json.load(f)
+            # Whole-file read in one call (no BufferedReader / text wrapper)
+            template_data = _json_loads(self.template_file.read_bytes())
         except json.JSONDecodeError as e:
             raise json.JSONDecodeError(
                 f"Invalid JSON in {self.template_file}: {e.msg}",
@@ -100,27 +215,40 @@ class PromptLibrary:
                 e.pos
             )
         
-        # Convert JSON to ChatPromptTemplate objects
-        for template_name, config in template_data.items():
-            try:
-                # Validate structure
-                if "messages" not in config:
-                    raise ValueError(f"Template '{template_name}' missing 'messages' field")
-                
-                # Store metadata
-                self.template_metadata[template_name] = {
-                    "pattern": config.get("pattern", "Unknown"),
+        # Check the whole file's structure in one pass before indexing
+        try:
+            _template_file_validator()(template_data)
+        except fastjsonschema.JsonSchemaValueException as e:
+            raise ValueError(f"Invalid template structure in {self.template_file.name}: {e.message}")
+        
+        # Index every template (compilation happens on first use).
+        # The schema check above already guarantees the structure, so one
+        # try around the whole loop is enough to name the failing template.
+        template_name = "<none>"
+        try:
+            for template_name, config in template_data.items():
+                # Store metadata (read-only)
+                input_variables = tuple(config.get("input_variables", []))
+                self.template_metadata[template_name] = MappingProxyType({
+                    "pattern": sys.intern(config.get("pattern", "Unknown")),
                     "description": config.get("description", "No description"),
-                    "input_variables": config.get("input_variables", [])
-                }
+                    "input_variables": input_variables,
+                    # Optional cap on response length (None = use the config preset)
+                    "max_output_tokens": config.get("max_output_tokens"),
+                    # "json" for templates that must answer with a JSON object
+                    "output_format": config.get("output_format", "text"),
+                    # JSON Schema for native structured output (None = free text)
+                    "output_schema": config.get("output_schema")
+                })
+                self._declared_variables[template_name] = frozenset(input_variables)
                 
                 # Build message tuples for ChatPromptTemplate
                 messages = []
+                variables = set()
                 for msg in config["messages"]:
-                    if "role" not in msg or "content" not in msg:
-                        raise ValueError(
-                            f"Template '{template_name}' has invalid message: {msg}"
-                        )
+                    # Interned: every "system"/"user" role shares one string object,
+                    # so role-keyed dict lookups match on identity
+                    role = sys.intern(msg["role"])
                     
                     # Support both string and array content
                     content = msg["content"]
@@ -128,17 +256,80 @@ class PromptLibrary:
                         # Join array elements with newlines for readability
                         content = "\n".join(content)
                     
-                    messages.append((msg["role"], content))
-                
-                # Create ChatPromptTemplate
-                self.templates[template_name] = ChatPromptTemplate.from_messages(messages)
+                    # Keep the system prompt static (prompt-cache friendly)
+                    placeholders = _placeholders(content)
+                    if role == "system" and placeholders:
+                        raise ValueError(
+                            f"Template '{template_name}' uses variables in its system "
+                            f"message: {sorted(placeholders)}. "
+                            f"Move them to the user message."
+                        )
+                    
+                    messages.append((role, content))
+                    variables |= placeholders
                 
-            except Exception as e:
-                raise ValueError(
-                    f"Failed to load template '{template_name}': {str(e)}"
-                )
+                self._raw_messages[template_name] = messages
+                self._raw_template_json[template_name] = config
+                self.required_variables[template_name] = frozenset(variables)
+        
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(
+                f"Failed to load template '{template_name}': {str(e)}"
+            ) from e
         
-        print(f"✅ Loaded {len(self.templates)} templates from {self.template_file.name}")
+        logger.debug("Loaded %d templates from %s", len(self.template_metadata), self.template_file.name)
+    
+    def _compile_template(self, name: str) -> ChatPromptTemplate:
+        """
+        Compile one indexed template into a ChatPromptTemplate and cache it.
+        
+        Also prebuilds the SystemMessage of system + user templates, so
+        format_messages() only has to create the user message.
+        """
+        from langchain_core import prompts
+        
+        messages = self._raw_messages[name]
+        # Build each message prompt directly; other roles go through from_messages
+        compiled = prompts.ChatPromptTemplate.from_messages([
+            getattr(prompts, _ROLE_PROMPT_CLASSES[role]).from_template(content)
+            if role in _ROLE_PROMPT_CLASSES else (role, content)
+            for role, content in messages
+        ])
+        self._templates[name] = compiled
+        
+        # Static system message: build it once, reuse it on every call
+        if [role for role, _ in messages] == ["system", "user"]:
+            # Formatted through the compiled prompt so {{ }} escapes become literal braces
+            self.system_messages[name] = compiled.messages[0].format()
+            self.user_templates[name] = messages[1][1]
+        
+        return compiled
+    
+    def compile_all(self) -> int:
+        """
+        Compile every template now instead of on first use.
+        
+        Useful when startup should do all the work up front (e.g. a server
+        warming up before taking traffic). Compiling is CPU-bound Python, so
+        it runs in a thread pool only on free-threaded builds (3.13t+) with at
+        least PARALLEL_COMPILE_MIN_TEMPLATES templates; otherwise serially.
+        
+        Returns:
+            Number of compiled templates
+        """
+        pending = [name for name in self.list_templates() if name not in self._templates]
+        gil_enabled = getattr(sys, "_is_gil_enabled", lambda: True)()
+        
+        if pending and not gil_enabled and len(pending) >= PARALLEL_COMPILE_MIN_TEMPLATES:
+            # First one serially so langchain is imported before the threads start
+            self._compile_template(pending[0])
+            with ThreadPoolExecutor() as pool:
+                list(pool.map(self._compile_template, pending[1:]))
+        else:
+            for name in pending:
+                self._compile_template(name)
+        
+        return len(self._templates)
     
     def reload_templates(self):
         """
@@ -149,10 +340,19 @@ class PromptLibrary:
           • A/B testing (switch template versions on the fly)
           • Production (update prompts without deployment)
         """
-        self.templates.clear()
+        self._templates.clear()
         self.template_metadata.clear()
-        self._load_templates()
-        print(f"🔄 Reloaded {len(self.templates)} templates")
+        self._raw_messages.clear()
+        self._raw_template_json.clear()
+        self.required_variables.clear()
+        self._declared_variables.clear()
+        self.system_messages.clear()
+        self.user_templates.clear()
+        self._sorted_names = None
+        self._categories_cache = None
+        self._format_cached.cache_clear()
+        self._load_index()
+        logger.info("Reloaded %d templates", len(self.template_metadata))
     
     def get_template(self, name: str) -> ChatPromptTemplate:
         """
@@ -162,7 +362,7 @@ class PromptLibrary:
             name: Template name (e.g., "sentiment_v3")
         
         Returns:
-            ChatPromptTemplate ready for formatting
+            ChatPromptTemplate ready for formatting (compiled on first request)
         
         Raises:
             ValueError: If template not found
@@ -171,15 +371,101 @@ class PromptLibrary:
             template = lib.get_template("sentiment_v3")
             messages = template.format_messages(text="Great product!")
         """
-        if name not in self.templates:
-            available = ", ".join(sorted(self.templates.keys()))
+        # Happy path: a single dict probe
+        template = self._templates.get(name)
+        if template is not None:
+            return template
+        if name not in self._raw_messages:
+            available = ", ".join(self.list_templates())  # Sorted once, cached
             raise ValueError(
                 f"Template '{name}' not found.\n"
                 f"Available templates: {available}"
             )
-        return self.templates[name]
+        return self._compile_template(name)
     
-    def get_template_info(self, name: str) -> Dict:
+    def format_messages(self, name: str, variables: Dict[str, Any]) -> List[BaseMessage]:
+        """
+        Format a template into messages ready to send.
+        
+        Same result as get_template(name).format_messages(**variables), but
+        for system + user templates the system message is the prebuilt
+        (cached) object and only the user message is created per call.
+        
+        Args:
+            name: Template name
+            variables: Dict of variable values
+        
+        Returns:
+            List of messages (system + user)
+        
+        Example:
+            messages = lib.format_messages("sentiment_v3", {"text": "Great!"})
+        """
+        from langchain_core.messages import HumanMessage
+        
+        template = self.get_template(name)
+        if name in self.system_messages:
+            return [
+                self.system_messages[name],
+                HumanMessage(content=self.user_templates[name].format(**variables)),
+            ]
+        return template.format_messages(**variables)
+    
+    def format(self, name: str, /, **variables: Any) -> Tuple[Tuple[str, str], ...]:
+        """
+        Format a template into (role, content) pairs, memoizing the result.
+        
+        Repeated calls with identical variables (replays, benchmarks, cached
+        retrieval contexts) return the stored tuple instead of formatting
+        again. The result is immutable, so it's safe to share.
+        
+        Args:
+            name: Template name (positional-only, so a template may also
+                use a variable called "name")
+            **variables: Variable values
+        
+        Returns:
+            Tuple of (message type, content) pairs, e.g. (("system", ...), ("human", ...))
+        
+        Example:
+            messages = lib.format("sentiment_v3", text="Great!")
+        """
+        try:
+            # The type is part of the key: 1, 1.0 and True hash equal but
+            # format differently
+            key = frozenset((var, type(value), value) for var, value in variables.items())
+        except TypeError:
+            # Unhashable values (lists, dicts): format without caching
+            return self._format_uncached(name, variables.items())
+        return self._format_cached(name, key)
+    
+    def _format_from_key(self, name: str, key: FrozenSet[Tuple[str, type, Any]]) -> Tuple[Tuple[str, str], ...]:
+        """format() for a cache key of (variable, type, value) triples."""
+        return self._format_uncached(name, ((var, value) for var, _, value in key))
+    
+    def _format_uncached(self, name: str, items) -> Tuple[Tuple[str, str], ...]:
+        """format() without the cache (items: (variable, value) pairs)."""
+        messages = self.format_messages(name, dict(items))
+        return tuple((message.type, message.content) for message in messages)
+    
+    def get_required_variables(self, name: str) -> FrozenSet[str]:
+        """
+        Get the variables a template needs, as a frozenset.
+        
+        Args:
+            name: Template name
+        
+        Returns:
+            Frozenset of variable names (precomputed when templates load)
+        
+        Raises:
+            ValueError: If template not found
+        """
+        if name not in self.required_variables:
+            raise ValueError(f"Template '{name}' not found")
+        return self.required_variables[name]
+    
+    def get_template_info(self, name: str) -> Mapping[str, Any]:
         """
         Get metadata about a template without loading it.
         
@@ -187,12 +473,13 @@ class PromptLibrary:
             name: Template name
         
         Returns:
-            Dict with pattern, description, input_variables
+            Read-only mapping with pattern, description, input_variables (tuple),
+            max_output_tokens, output_format, output_schema
         
         Example:
             info = lib.get_template_info("sentiment_v3")
             print(info["description"])  # "Production-ready sentiment..."
-            print(info["input_variables"])  # ["text"]
+            print(info["input_variables"])  # ("text",)
         """
         if name not in self.template_metadata:
             raise ValueError(f"Template '{name}' not found")
@@ -213,12 +500,19 @@ class PromptLibrary:
             all_templates = lib.list_templates()
             sentiment_templates = lib.list_templates("sentiment")
         """
+        if self._sorted_names is None:
+            self._sorted_names = tuple(sorted(self.template_metadata.keys()))
         if category:
-            return sorted([
-                name for name in self.templates.keys()
-                if name.startswith(category.lower())
-            ])
-        return sorted(self.templates.keys())
+            # Names sharing a prefix are contiguous in sorted order: binary-search
+            # to the first one and stop at the first name that doesn't match
+            prefix = category.lower()
+            matches = []
+            for name in islice(self._sorted_names, bisect_left(self._sorted_names, prefix), None):
+                if not name.startswith(prefix):
+                    break
+                matches.append(name)
+            return matches
+        return list(self._sorted_names)
     
     def list_categories(self) -> Dict[str, List[str]]:
         """
@@ -226,6 +520,7 @@ class PromptLibrary:
         
         Returns:
             Dict mapping category name to list of templates
+            (computed once per load; treat it as read-only)
         
         Example:
             categories = lib.list_categories()
@@ -235,17 +530,21 @@ class PromptLibrary:
             #     ...
             # }
         """
+        if self._categories_cache is not None:
+            return self._categories_cache
+        
         categories = {}
-        for name in self.templates.keys():
+        for name in self.list_templates():
             # Extract category from template name (e.g., "sentiment_v1" -> "sentiment")
             category = name.split("_")[0] if "_" in name else name
             if category not in categories:
                 categories[category] = []
-            categories[category].append(name)
+            categories[category].append(name)  # Names arrive sorted
         
-        return {k: sorted(v) for k, v in sorted(categories.items())}
+        self._categories_cache = {k: categories[k] for k in sorted(categories)}
+        return self._categories_cache
     
-    def get_input_variables(self, name: str) -> List[str]:
+    def get_input_variables(self, name: str) -> Sequence[str]:
         """
         Get required input variables for a template.
         
@@ -253,11 +552,11 @@ class PromptLibrary:
             name: Template name
         
         Returns:
-            List of variable names (e.g., ["text", "tone"])
+            Tuple of variable names (e.g., ("text", "tone"))
         
         Example:
             vars = lib.get_input_variables("blog_post_v1")
-            # ["topic", "keywords", "tone", "length"]
+            # ("topic", "keywords", "tone", "length")
         """
         return self.get_template_info(name)["input_variables"]
     
@@ -281,15 +580,17 @@ class PromptLibrary:
             except ValueError as e:
                 print(e)  # Lists missing variables
         """
-        required = set(self.get_input_variables(name))
-        provided = set(variables.keys())
-        missing = required - provided
+        if name not in self._declared_variables:
+            raise ValueError(f"Template '{name}' not found")
+        required = self._declared_variables[name]
+        # .difference() takes the dict directly (iterates its keys)
+        missing = required.difference(variables)
         
         if missing:
             raise ValueError(
                 f"Template '{name}' missing required variables: {', '.join(missing)}\n"
                 f"Required: {', '.join(sorted(required))}\n"
-                f"Provided: {', '.join(sorted(provided))}"
+                f"Provided: {', '.join(sorted(variables))}"
             )
         
         return True
@@ -310,27 +611,24 @@ class PromptLibrary:
         Example:
             lib.export_template("sentiment_v3", "sentiment_v3_backup.json")
         """
-        if name not in self.templates:
+        if name not in self.template_metadata:
             raise ValueError(f"Template '{name}' not found")
         
-        # Load original JSON to preserve structure
-        with open(self.template_file, 'r') as f:
-            all_templates = json.load(f)
-        
-        # Export just this template
-        template_data = {name: all_templates[name]}
+        # Export just this template (original JSON entry, kept from load)
+        template_data = {name: self._raw_template_json[name]}
         
         output_path = Path(output_file)
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(template_data, f, indent=2, ensure_ascii=False)
+        output_path.write_bytes(
+            json.dumps(template_data, indent=2, ensure_ascii=False).encode('utf-8')
+        )
         
-        print(f"✅ Exported template '{name}' to {output_path}")
+        logger.info("Exported template '%s' to %s", name, output_path)
     
     def __repr__(self) -> str:
         """String representation showing loaded templates."""
         return (
             f"PromptLibrary("
-            f"templates={len(self.templates)}, "
+            f"templates={len(self.template_metadata)}, "
             f"file={self.template_file.name}"
             f")"
         )
@@ -381,10 +679,12 @@ def validate_template_file(template_file: str = "templates.json") -> bool:
     """
     try:
         lib = PromptLibrary(template_file)
-        print(f"✅ Template file is valid ({len(lib.templates)} templates)")
+        # Templates compile lazily, so compile each one to surface any errors
+        compiled = lib.compile_all()
+        logger.info("Template file is valid (%d templates)", compiled)
         return True
     except Exception as e:
-        print(f"❌ Template file validation failed: {e}")
+        logger.error("Template file validation failed: %s", e)
         raise
 
 
@@ -395,6 +695,9 @@ def validate_template_file(template_file: str = "templates.json") -> bool:
 if __name__ == "__main__":
     """Demonstrate template library usage."""
     
+    # Show the library's log messages (template loading etc.) in the demo
+    logging.basicConfig(level=logging.DEBUG, format="%(message)s")
+    
     print("=" * 70)
     print("PROMPT TEMPLATE LIBRARY - JSON-BASED ARCHITECTURE")
     print("=" * 70)
@@ -0,0 +1,63 @@
+"""Tests for prompt_templates.PromptLibrary (run with: python -m pytest)"""
+
+import json
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from prompt_templates import PromptLibrary
+
+
+@pytest.fixture(scope="module")
+def lib():
+    return PromptLibrary()
+
+
+def test_format_messages_matches_compiled_template(lib):
+    """The cached system-message fast path must produce the same messages"""
+    for name in lib.list_templates():
+        variables = {var: f"value of {var}" for var in lib.get_required_variables(name)}
+        assert lib.format_messages(name, variables) == \
+            lib.get_template(name).format_messages(**variables), name
+
+
+def test_format_accepts_variable_called_name(tmp_path):
+    """format() takes the template name positionally, freeing 'name' for variables"""
+    template_file = tmp_path / "templates.json"
+    template_file.write_text(json.dumps({
+        "greeting": {
+            "pattern": "Zero-Shot",
+            "description": "Greets a user by name",
+            "input_variables": ["name"],
+            "messages": [
+                {"role": "system", "content": "You are friendly."},
+                {"role": "user", "content": "Say hello to {name}"}
+            ]
+        }
+    }))
+    lib = PromptLibrary(str(template_file))
+    assert lib.format("greeting", name="Ada") == (
+        ("system", "You are friendly."),
+        ("human", "Say hello to Ada"),
+    )
+
+
+def test_output_schema_covers_documented_fields(lib):
+    """Structured output must not drop fields the JSON example promises"""
+    for name in lib.list_templates():
+        schema = lib.get_template_info(name)["output_schema"]
+        if schema is None:
+            continue
+        system_text = lib.format_messages(
+            name, {var: "" for var in lib.get_required_variables(name)}
+        )[0].content
+        example = next(line for line in system_text.splitlines() if line.startswith("{"))
+        assert set(json.loads(example)) == set(schema["properties"]), name
+
+
+def test_format_cache_distinguishes_equal_values_of_different_types(lib):
+    """1, 1.0 and True are equal (and hash equal) but must not share a cache entry"""
+    assert lib.format("sentiment_v1", text=1)[-1] == ("human", "Text: 1")
+    assert lib.format("sentiment_v1", text=True)[-1] == ("human", "Text: True")
+    assert lib.format("sentiment_v1", text=1.0)[-1] == ("human", "Text: 1.0")